@@ -0,0 +1,7 @@
+"""
+Benchmarks behind the ``benchmark_*`` management commands, one module each:
+``views`` (every named route, also used by the smoke test in ``base/tests.py``),
+``revisions``, ``storage``, ``concurrency`` and ``database``. ``common`` holds
+the seeded dataset and ``BenchmarkCommand``. Always run against a throwaway
+test database.
+"""
@@ -0,0 +1,114 @@
+"""
+Shared pieces of the benchmarks: the seeded dataset and ``BenchmarkCommand``,
+the base of the ``benchmark_*`` management commands.
+"""
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from ..documents import update_document
+from ..models import Task, Post, Document, Room, Message
+from ..search import get_search_backend
+
+SCALES = {
+    'tiny': {'users': 2, 'tasks': 10, 'posts': 10, 'messages': 20, 'documents': 5},
+    'small': {'users': 5, 'tasks': 200, 'posts': 100, 'messages': 500, 'documents': 50},
+    'medium': {'users': 20, 'tasks': 2000, 'posts': 1000, 'messages': 5000, 'documents': 300},
+    'large': {'users': 50, 'tasks': 20000, 'posts': 5000, 'messages': 50000, 'documents': 1000},
+}
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+DOCUMENT_BODY = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40
+DOCUMENT_EDITS = 20
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+def seed(counts):
+    """Create a dataset of the given size and return the objects the routes need."""
+    now = timezone.now()
+    users = [User.objects.create_user(f'bench{i}', password=BENCHMARK_PASSWORD) for i in range(counts['users'])]
+    user = users[0]
+
+    # Half of the tasks belong to the benchmarked user, spread over two months.
+    Task.objects.bulk_create([
+        Task(
+            user=user if i % 2 == 0 else users[i % len(users)],
+            title=f'Task {i}',
+            description=f'Description for task {i}',
+            complete=i % 3 == 0,
+            created=now - timedelta(days=i % 30, minutes=i),
+            deadline=now + timedelta(days=1 + i % 30),
+        )
+        for i in range(counts['tasks'])
+    ])
+    Post.objects.bulk_create([
+        Post(title=f'Post {i}', content=f'Post body {i}', author=users[i % len(users)],
+             date_posted=now - timedelta(minutes=i))
+        for i in range(counts['posts'])
+    ])
+    Document.objects.bulk_create([
+        Document(title=f'Document {i}', content=DOCUMENT_BODY) for i in range(counts['documents'])
+    ])
+    room = Room.objects.create(name='benchmark')
+    Message.objects.bulk_create([
+        Message(value=f'Message {i}', user=users[i % len(users)].username, room=room,
+                date=now - timedelta(seconds=counts['messages'] - i))
+        for i in range(counts['messages'])
+    ])
+    get_search_backend().rebuild()
+
+    document = Document.objects.first()
+    for i in range(DOCUMENT_EDITS):
+        update_document(document, document.content + f'Edit {i}\n')
+
+    return {
+        'user': user,
+        'task': Task.objects.filter(user=user).first(),
+        'task_ids': list(Task.objects.filter(user=user).values_list('id', flat=True)[:50]),
+        'post': Post.objects.filter(author=user).first(),
+        'document': document,
+        'room': room,
+        'now': now,
+    }
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base for the ``benchmark_*`` commands: runs ``run(options)`` in a fresh
+    test database and writes the returned report to ``--output`` as JSON.
+    """
+    # Put the SQLite test database in a file, for benchmarks whose worker
+    # threads open their own connections; an in-memory one is not shared.
+    file_database = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def run(self, options):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if self.file_database and connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.finish(report, options)
+
+    def finish(self, report, options):
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
@@ -0,0 +1,153 @@
+"""Async against sync views under load, for the ``benchmark_concurrency`` command."""
+import asyncio
+import statistics
+import threading
+import time
+import types
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.test import Client, override_settings
+from django.urls import path as url_path, reverse
+from django.utils import timezone
+
+from .. import urls
+from ..models import Message
+from .common import SCALES, seed
+from .views import VIEW_REQUESTS
+
+# Async views in base.views, compared with the same code run the sync way.
+ASYNC_ROUTES = ('getMessages', 'send', 'check_task', 'get-task-ajax', 'task-create-ajax')
+
+
+class _BenchmarkASGIHandler(ASGIHandler):
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            # Like the test client: the benchmark cannot round-trip a CSRF token.
+            request._dont_enforce_csrf_checks = True
+        return request, error_response
+
+
+def _as_sync(view):
+    """``view`` as a plain sync view: Django runs it in a thread that is held until it returns."""
+    def sync_view(request, *args, **kwargs):
+        return async_to_sync(view)(request, *args, **kwargs)
+    return sync_view
+
+
+def _async_urlconf(sync):
+    module = types.ModuleType('base_benchmark_sync_urls' if sync else 'base_benchmark_async_urls')
+    module.urlpatterns = [
+        url_path(str(pattern.pattern), _as_sync(pattern.callback) if sync else pattern.callback, name=pattern.name)
+        for pattern in urls.urlpatterns if pattern.name in ASYNC_ROUTES
+    ]
+    return module
+
+
+async def _asgi_request(app, method, path, data, cookie):
+    path, _, query = path.partition('?')
+    headers = [(b'cookie', cookie.encode())]
+    body = b''
+    if data is not None:
+        if isinstance(data, str):
+            body, content_type = data.encode(), b'application/json'
+        else:
+            body, content_type = urlencode(data).encode(), b'application/x-www-form-urlencoded'
+        headers.append((b'content-type', content_type))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method.upper(),
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = None
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+async def _load(app, request, concurrency, total, cookie):
+    latencies, statuses, peak = [], [], threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.002)
+
+    async def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            statuses.append(await _asgi_request(app, *request, cookie))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    sampler = asyncio.ensure_future(sample_threads())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(total // concurrency + (i < total % concurrency)) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await sampler
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'latency_ms': {'median': round(statistics.median(latencies), 3),
+                       'p95': round(latencies[int(len(latencies) * 0.95) - 1], 3)},
+        'errors': sum(1 for status in statuses if status >= 400),
+        'peak_threads': peak,
+    }
+
+
+def run_concurrency_benchmark(concurrency=(1, 10, 50), requests=200, wait=1.0, log=None):
+    """
+    Drive the async chat and task endpoints through Django's ASGI handler in
+    this process, once as async views and once wrapped as sync views, at each
+    concurrency level. ``getMessages (wait)`` is a chat long-poll that times
+    out after ``wait`` seconds, the case that ties up one thread per client.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    cache.clear()
+    ctx = seed(SCALES['small'])
+    client = Client()
+    client.force_login(ctx['user'])
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    report = {'generated_at': timezone.now().isoformat(), 'requests': requests, 'wait': wait, 'modes': {}}
+    for mode in ('sync', 'async'):
+        with override_settings(ROOT_URLCONF=_async_urlconf(mode == 'sync')):
+            app = _BenchmarkASGIHandler()
+            results = report['modes'][mode] = {}
+            for name in (*ASYNC_ROUTES, 'getMessages (wait)'):
+                results[name] = {}
+                for level in concurrency:
+                    if name in VIEW_REQUESTS:
+                        request, total = VIEW_REQUESTS[name](ctx)[:3], requests
+                    else:
+                        # One long-poll per client, past the newest message so it has to wait.
+                        last = Message.objects.order_by('-id').values_list('id', flat=True).first()
+                        request = ('get', reverse('getMessages', args=[ctx['room'].name])
+                                   + f'?after={last}&wait={wait}', None)
+                        total = level
+                    result = results[name][level] = asyncio.run(_load(app, request, level, total, cookie))
+                    if log:
+                        log(f'{mode:>5} {name:<20} x{level:<4} {result["requests_per_s"]:>8.1f} req/s '
+                            f'median {result["latency_ms"]["median"]:>8.2f} ms p95 {result["latency_ms"]["p95"]:>8.2f} ms '
+                            f'{result["peak_threads"]:>4} threads {result["errors"]} errors')
+    return report
@@ -0,0 +1,123 @@
+"""SQLite journal modes and persistent connections, for the ``benchmark_database`` command."""
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Room, Message
+
+# Database profiles compared by run_database_benchmark: SQLite's defaults
+# (rollback journal) against the production PRAGMAs.
+DATABASE_PROFILES = {
+    'rollback-journal': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'production': settings.SQLITE_PRAGMAS,
+}
+
+
+MESSAGES_PAGE = 50
+
+
+def _use_profile(pragmas, conn_max_age=0):
+    # Every thread's connection is built from this same settings dict.
+    connection.settings_dict.update({'PRAGMAS': pragmas, 'CONN_MAX_AGE': conn_max_age})
+    connections.close_all()
+
+
+def _read_write_load(room, readers, writers, duration):
+    stop = time.perf_counter() + duration
+    reads, writes, errors = [], [], []
+
+    def reader():
+        try:
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    # The chat poll: latest page of the room.
+                    [m.value for m in Message.objects.filter(room=room).order_by('-id')[:MESSAGES_PAGE]]
+                except Exception as e:
+                    errors.append(repr(e))
+                reads.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+
+    def writer():
+        now = timezone.now()
+        try:
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    Message.objects.create(value='benchmark message ' * 5, user='bench', room=room, date=now)
+                except Exception as e:
+                    errors.append(repr(e))
+                writes.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def summary(times):
+        times = sorted(times)
+        return {'per_s': round(len(times) / duration, 1), 'median_ms': round(statistics.median(times), 3),
+                'p99_ms': round(times[int(len(times) * 0.99) - 1], 3), 'max_ms': round(times[-1], 3)}
+
+    return {'reads': summary(reads), 'writes': summary(writes), 'errors': len(errors)}
+
+
+def _wsgi_requests(path, count):
+    """Requests through the full WSGI handler, including the connection open/close signals."""
+    handler = WSGIHandler()
+    environ = RequestFactory()._base_environ(PATH_INFO=path, REQUEST_METHOD='GET')
+    start = time.perf_counter()
+    for _ in range(count):
+        response = handler(dict(environ), lambda status, headers: None)
+        response.close()
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def run_database_benchmark(readers=8, writers=1, duration=3.0, requests=500, log=None):
+    """
+    Chat pollers and a writer hammering one SQLite file under each profile,
+    then request throughput with and without persistent connections.
+    """
+    if connection.vendor != 'sqlite':
+        raise ValueError('The database benchmark tunes SQLite and needs an SQLite database.')
+    report = {'generated_at': timezone.now().isoformat(), 'readers': readers, 'writers': writers,
+              'duration': duration, 'profiles': {}, 'connections': {}}
+    saved = {key: connection.settings_dict.get(key) for key in ('PRAGMAS', 'CONN_MAX_AGE')}
+    try:
+        call_command('flush', interactive=False, verbosity=0)
+        room = Room.objects.create(name='database-benchmark')
+        Message.objects.bulk_create([
+            Message(value=f'Message {i}', user='bench', room=room, date=timezone.now()) for i in range(2000)
+        ])
+
+        for name, pragmas in DATABASE_PROFILES.items():
+            _use_profile(pragmas)
+            result = report['profiles'][name] = _read_write_load(room, readers, writers, duration)
+            if log:
+                log(f'{name:>16}: {result["reads"]["per_s"]:>8.1f} reads/s (p99 {result["reads"]["p99_ms"]:.2f} ms, '
+                    f'max {result["reads"]["max_ms"]:.2f} ms), {result["writes"]["per_s"]:>7.1f} writes/s '
+                    f'(p99 {result["writes"]["p99_ms"]:.2f} ms), {result["errors"]} errors')
+
+        path = reverse('getMessages', args=[room.name])
+        for conn_max_age in (0, 600):
+            _use_profile(settings.SQLITE_PRAGMAS, conn_max_age)
+            rate = report['connections'][f'CONN_MAX_AGE={conn_max_age}'] = _wsgi_requests(path, requests)
+            if log:
+                log(f'CONN_MAX_AGE={conn_max_age:<4}: {rate:>8.1f} requests/s')
+    finally:
+        connection.settings_dict.update(saved)
+        connections.close_all()
+    return report
@@ -0,0 +1,61 @@
+"""Revision storage and rebuild time, for the ``benchmark_revisions`` command."""
+import random
+import statistics
+import time
+
+from django.test import override_settings
+from django.utils import timezone
+
+from ..documents import revision_content, update_document
+from ..models import Document, DocumentRevision
+
+def _edit(rng, lines):
+    """One typical save: change, insert or delete a line."""
+    action = rng.random()
+    position = rng.randrange(len(lines))
+    if action < 0.6:
+        lines[position] = f'{lines[position].rstrip()} edited {rng.randrange(10 ** 6)}\n'
+    elif action < 0.9 or len(lines) < 2:
+        lines.insert(position, f'New line {rng.randrange(10 ** 6)} ' + 'lorem ipsum ' * rng.randrange(1, 8) + '\n')
+    else:
+        del lines[position]
+
+
+def run_revision_benchmark(intervals, edits=200, lines=200, log=None):
+    """
+    Make ``edits`` saves to a ``lines``-line note for every snapshot interval
+    and report revision storage against full copies and rebuild time per version.
+    """
+    report = {'generated_at': timezone.now().isoformat(), 'edits': edits, 'lines': lines, 'intervals': {}}
+    for interval in intervals:
+        rng = random.Random(0)
+        text = [f'Line {i} ' + 'lorem ipsum dolor sit amet ' * rng.randrange(1, 5) + '\n' for i in range(lines)]
+        document = Document.objects.create(title='Revision benchmark', content=''.join(text))
+        full_bytes = len(document.content.encode())
+        save_times, rebuild_times = [], []
+        with override_settings(DOCUMENT_SNAPSHOT_INTERVAL=interval, DOCUMENT_REVISION_LIMIT=None):
+            for _ in range(edits):
+                _edit(rng, text)
+                start = time.perf_counter()
+                update_document(document, ''.join(text))
+                save_times.append((time.perf_counter() - start) * 1000)
+                full_bytes += len(document.content.encode())
+            for version in range(1, document.version):
+                start = time.perf_counter()
+                revision_content(document, version)
+                rebuild_times.append((time.perf_counter() - start) * 1000)
+
+        stored = sum(len(data) for data in DocumentRevision.objects.filter(document=document)
+                     .values_list('data', flat=True))
+        result = report['intervals'][interval] = {
+            'revision_bytes': stored,
+            'full_copy_bytes': full_bytes - len(document.content.encode()),
+            'save_ms': {'median': round(statistics.median(save_times), 3), 'max': round(max(save_times), 3)},
+            'rebuild_ms': {'median': round(statistics.median(rebuild_times), 3),
+                           'max': round(max(rebuild_times), 3)},
+        }
+        if log:
+            log(f'interval {interval:>4}: {result["revision_bytes"]:>9} bytes stored vs '
+                f'{result["full_copy_bytes"]:>9} in full copies, save {result["save_ms"]["median"]:.2f} ms, '
+                f'rebuild {result["rebuild_ms"]["median"]:.2f} ms median / {result["rebuild_ms"]["max"]:.2f} ms max')
+    return report
@@ -0,0 +1,93 @@
+"""Compressed against plain text columns, for the ``benchmark_storage`` command."""
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from ..models import Document, Room, Message
+
+WORDS = ('note meeting project deadline review draft budget report client design release issue fix test '
+         'deploy server database query index cache page user team plan idea todo done later call email').split()
+
+
+def _text(rng, size):
+    words = []
+    while sum(len(word) + 1 for word in words) < size:
+        words.append(rng.choice(WORDS))
+        if rng.random() < 0.08:
+            words[-1] += '.\n'
+    return ' '.join(words)
+
+
+def _stored_bytes(model, field):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(field).column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COALESCE(SUM(LENGTH({column})), 0) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def _database_bytes():
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute('PRAGMA page_count')
+        pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return pages * cursor.fetchone()[0]
+
+
+def _median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def run_storage_benchmark(documents=300, messages=5000, repeat=5, log=None):
+    """
+    Store the same notes and chat history once as plain text and once with
+    compression on, and compare column bytes, database size and read time.
+    """
+    report = {'generated_at': timezone.now().isoformat(), 'documents': documents, 'messages': messages,
+              'threshold': getattr(settings, 'COMPRESSED_TEXT_THRESHOLD', 1024), 'modes': {}}
+    for mode, threshold in (('plain', None), ('compressed', report['threshold'])):
+        with override_settings(COMPRESSED_TEXT_THRESHOLD=threshold):
+            Document.objects.all().delete()
+            Room.objects.all().delete()
+            rng = random.Random(0)
+            Document.objects.bulk_create([
+                Document(title=f'Document {i}', content=_text(rng, rng.randrange(500, 20000)))
+                for i in range(documents)
+            ])
+            room = Room.objects.create(name='storage-benchmark')
+            now = timezone.now()
+            # Chat is mostly short lines with the odd pasted log or snippet.
+            Message.objects.bulk_create([
+                Message(value=_text(rng, 5000 if i % 20 == 0 else rng.randrange(10, 200)), user='bench', room=room,
+                        date=now)
+                for i in range(messages)
+            ])
+
+            result = report['modes'][mode] = {
+                'document_bytes': _stored_bytes(Document, 'content'),
+                'message_bytes': _stored_bytes(Message, 'value'),
+                'database_bytes': _database_bytes(),
+                'read_ms': {
+                    'documents_without_content': _median_ms(lambda: list(Document.objects.all()), repeat),
+                    'documents': _median_ms(lambda: [len(d.content) for d in Document.objects.all()], repeat),
+                    'messages': _median_ms(lambda: [len(m.value) for m in Message.objects.all()], repeat),
+                },
+            }
+        if log:
+            log(f'{mode:>10}: documents {result["document_bytes"]:>10} bytes, messages {result["message_bytes"]:>9} '
+                f'bytes, database {result["database_bytes"]} bytes, read documents '
+                f'{result["read_ms"]["documents"]:.2f} ms, messages {result["read_ms"]["messages"]:.2f} ms')
+    return report
@@ -0,0 +1,175 @@
+"""
+Time every named route in ``base.urls`` against a seeded dataset.
+
+Used by the ``benchmark_views`` management command and the smoke test in
+``base/tests.py``. Always run against a throwaway test database.
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import urls
+from ..models import Document
+from .common import SCALES, seed
+
+def _new_document(ctx):
+    return Document.objects.create(title='Scratch', content='scratch').pk
+
+
+# Route name -> callable(ctx) returning (method, path, data, anonymous).
+# Routes that are missing here are reported as skipped.
+VIEW_REQUESTS = {
+    'login': lambda ctx: ('get', reverse('login'), None, True),
+    'logout': lambda ctx: ('get', reverse('logout'), None, False),
+    'register': lambda ctx: ('get', reverse('register'), None, True),
+    'tasks': lambda ctx: ('get', reverse('tasks'), None, False),
+    'tasks-more': lambda ctx: ('get', reverse('tasks-more'), None, False),
+    'task': lambda ctx: ('get', reverse('task', args=[ctx['task'].pk]), None, False),
+    'task-create': lambda ctx: ('get', reverse('task-create'), None, False),
+    'task-update': lambda ctx: ('get', reverse('task-update', args=[ctx['task'].pk]), None, False),
+    'task-delete': lambda ctx: ('get', reverse('task-delete', args=[ctx['task'].pk]), None, False),
+    'check_task': lambda ctx: ('get', reverse('check_task', args=[ctx['task'].pk]), None, False),
+    'task-create-ajax': lambda ctx: ('post', reverse('task-create-ajax'), {
+        'title': 'Benchmark task', 'description': 'created by the benchmark',
+        'created': ctx['now'].isoformat(), 'deadline': (ctx['now'] + timedelta(days=7)).isoformat(),
+    }, False),
+    'task-bulk': lambda ctx: ('post', reverse('task-bulk'), json.dumps({
+        'operation': 'complete', 'ids': ctx['task_ids'],
+    }), False),
+    'task-calendar-current': lambda ctx: ('get', reverse('task-calendar-current'), None, False),
+    'task-calendar': lambda ctx: ('get', reverse('task-calendar', args=[ctx['now'].year, ctx['now'].month]), None, False),
+    'get-task-ajax': lambda ctx: ('get', reverse('get-task-ajax', args=[ctx['task'].pk]), None, False),
+    'profile': lambda ctx: ('get', reverse('profile'), None, False),
+    'blog-home': lambda ctx: ('get', reverse('blog-home'), None, False),
+    'posts-more': lambda ctx: ('get', reverse('posts-more'), None, False),
+    'post-detail': lambda ctx: ('get', reverse('post-detail', args=[ctx['post'].pk]), None, False),
+    'post-create': lambda ctx: ('get', reverse('post-create'), None, False),
+    'post-update': lambda ctx: ('get', reverse('post-update', args=[ctx['post'].pk]), None, False),
+    'blog-about': lambda ctx: ('get', reverse('blog-about'), None, False),
+    'metrics': lambda ctx: ('get', reverse('metrics'), None, False),
+    'search': lambda ctx: ('get', reverse('search') + '?q=task', None, False),
+    'editor': lambda ctx: ('get', reverse('editor') + f'?docid={ctx["document"].pk}', None, False),
+    'autosave-document': lambda ctx: ('post', reverse('autosave-document', args=[ctx['document'].pk]), json.dumps({
+        'version': Document.objects.values_list('version', flat=True).get(pk=ctx['document'].pk),
+        'patches': [{'start': 0, 'end': 0, 'text': 'x'}],
+    }), False),
+    'document-revisions': lambda ctx: ('get', reverse('document-revisions', args=[ctx['document'].pk]), None, False),
+    'document-revision': lambda ctx: ('get', reverse('document-revision', args=[ctx['document'].pk, 1]), None, False),
+    'restore-document-revision': lambda ctx: (
+        'post', reverse('restore-document-revision', args=[ctx['document'].pk, 1]), None, False,
+    ),
+    'delete_document': lambda ctx: ('get', reverse('delete_document', args=[_new_document(ctx)]), None, False),
+    'home': lambda ctx: ('get', reverse('home'), None, False),
+    'room': lambda ctx: ('get', reverse('room', args=[ctx['room'].name]) + '?username=bench0', None, False),
+    'checkview': lambda ctx: ('post', reverse('checkview'), {
+        'room_name': ctx['room'].name, 'username': 'bench0',
+    }, False),
+    'send': lambda ctx: ('post', reverse('send'), {
+        'message': 'benchmark message', 'username': 'bench0', 'room_id': ctx['room'].pk,
+    }, False),
+    'getMessages': lambda ctx: ('get', reverse('getMessages', args=[ctx['room'].name]), None, False),
+}
+
+
+def _timed_request(ctx, spec):
+    method, path, data, anonymous = spec(ctx)
+    client = Client()
+    if not anonymous:
+        client.force_login(ctx['user'])
+    kwargs = {}
+    if isinstance(data, str):
+        kwargs['content_type'] = 'application/json'
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = getattr(client, method)(path, data, **kwargs)
+        elapsed = time.perf_counter() - start
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return {
+        'method': method.upper(),
+        'path': path,
+        'status': response.status_code,
+        'queries': len(queries),
+        'time_ms': elapsed * 1000,
+        'bytes': len(body),
+    }
+
+
+def measure(ctx, spec, repeat=3):
+    """Run one cold request, then ``repeat`` warm ones, and summarise them."""
+    cold = _timed_request(ctx, spec)
+    warm = [_timed_request(ctx, spec) for _ in range(repeat)]
+    times = [run['time_ms'] for run in warm]
+    last = warm[-1]
+    return {
+        'method': last['method'],
+        'path': last['path'],
+        'status': last['status'],
+        'queries_cold': cold['queries'],
+        'queries': last['queries'],
+        'bytes': last['bytes'],
+        'time_ms': {
+            'cold': round(cold['time_ms'], 3),
+            'min': round(min(times), 3),
+            'median': round(statistics.median(times), 3),
+        },
+    }
+
+
+def run_benchmark(scales, repeat=3, log=None):
+    report = {'generated_at': timezone.now().isoformat(), 'repeat': repeat, 'scales': {}}
+    for scale in scales:
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        counts = SCALES[scale]
+        ctx = seed(counts)
+
+        views, skipped = {}, []
+        for pattern in urls.urlpatterns:
+            if not pattern.name:
+                continue
+            spec = VIEW_REQUESTS.get(pattern.name)
+            if spec is None:
+                skipped.append(pattern.name)
+                continue
+            views[pattern.name] = measure(ctx, spec, repeat)
+            if log:
+                result = views[pattern.name]
+                log(f'{scale:>7} {pattern.name:<24} {result["status"]} {result["queries"]:>4} queries '
+                    f'{result["time_ms"]["median"]:>9.2f} ms {result["bytes"]:>9} bytes')
+        report['scales'][scale] = {'counts': counts, 'views': views, 'skipped': skipped}
+    return report
+
+
+def find_regressions(report, baseline, tolerance=0.25, min_delta_ms=5.0):
+    """
+    Compare ``report`` against ``baseline``. Any extra query, a status change
+    or a median slowdown beyond ``tolerance`` (and ``min_delta_ms``, to ignore
+    timer noise) counts as a regression.
+    """
+    regressions = []
+    for scale, data in report['scales'].items():
+        baseline_views = baseline.get('scales', {}).get(scale, {}).get('views', {})
+        for name, result in data['views'].items():
+            old = baseline_views.get(name)
+            if old is None:
+                continue
+            if result['status'] != old['status']:
+                regressions.append({'scale': scale, 'view': name, 'metric': 'status',
+                                    'baseline': old['status'], 'current': result['status']})
+            if result['queries'] > old['queries']:
+                regressions.append({'scale': scale, 'view': name, 'metric': 'queries',
+                                    'baseline': old['queries'], 'current': result['queries']})
+            old_ms, new_ms = old['time_ms']['median'], result['time_ms']['median']
+            if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > min_delta_ms:
+                regressions.append({'scale': scale, 'view': name, 'metric': 'time_ms',
+                                    'baseline': old_ms, 'current': new_ms})
+    return regressions
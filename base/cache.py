@@ -0,0 +1,63 @@
+"""
+Per-user caches of task data, invalidated by bumping a version key on every
+task write, and a version of the author data shown in the post feed. The
+versions live in the default cache, which must be shared by
+all worker processes (see CACHES in settings); a per-process cache would only
+invalidate entries in the process that handled the write.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import Task
+
+TASK_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(user_id):
+    return f'tasks:version:{user_id}'
+
+
+def get_task_cache_version(user_id):
+    # An evicted version key simply starts a fresh generation of entries.
+    return cache.get_or_set(_version_key(user_id), time.time_ns, None)
+
+
+def invalidate_task_cache(user_id):
+    cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def get_open_task_count(user):
+    key = f'tasks:open-count:{user.pk}:{get_task_cache_version(user.pk)}'
+    return cache.get_or_set(
+        key,
+        lambda: Task.objects.filter(user=user).open().count(),
+        TASK_CACHE_TIMEOUT,
+    )
+
+
+def get_task_list_page(user, build):
+    """Cache ``build()``, the rendered first page of the user's task list."""
+    key = f'tasks:list:{user.pk}:{get_task_cache_version(user.pk)}'
+    return cache.get_or_set(key, build, TASK_CACHE_TIMEOUT)
+
+
+def get_task_calendar_grid(user, year, month, build):
+    """
+    Cache ``build()``, the rendered day grid of a calendar month. Every task
+    write bumps the version, so it stands in for the newest modification time.
+    """
+    key = f'tasks:calendar:{user.pk}:{year}:{month}:{get_task_cache_version(user.pk)}'
+    return cache.get_or_set(key, build, TASK_CACHE_TIMEOUT)
+
+
+FEED_VERSION_KEY = 'posts:feed-version'
+
+
+def get_feed_version():
+    """When author names or profile pictures shown in the feed last changed, in nanoseconds."""
+    return cache.get_or_set(FEED_VERSION_KEY, time.time_ns, None)
+
+
+def invalidate_feed():
+    cache.set(FEED_VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,66 @@
+"""
+Conditional GET. A view decorated with ``conditional`` answers a matching
+``If-None-Match`` or ``If-Modified-Since`` with 304 before it queries or
+renders anything, and adds ``ETag`` and ``Last-Modified`` to full responses.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _check(request, etag, last_modified):
+    etag = quote_etag(etag) if etag else None
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _finish(request, response, etag, last_modified):
+    # A 304 carries the validators too, so caches can update what they hold.
+    if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+    if etag or last_modified:
+        # Revalidate on every use instead of guessing a freshness lifetime from Last-Modified.
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional(validators):
+    """
+    Like ``django.views.decorators.http.condition``, except that
+    ``validators(request, *args, **kwargs)`` returns ``(etag, last_modified)``
+    together, so both come from one query. Either may be None, and two Nones
+    serve the request unconditionally. Works on sync and async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                etag, last_modified, response = _check(
+                    request, *await sync_to_async(validators)(request, *args, **kwargs))
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return view(request, *args, **kwargs)
+                etag, last_modified, response = _check(request, *validators(request, *args, **kwargs))
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+        return inner
+    return decorator
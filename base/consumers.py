@@ -0,0 +1,40 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def room_group_name(room_id):
+    return f'chat_{room_id}'
+
+
+def message_to_dict(message):
+    return {
+        'id': message.id,
+        'value': message.value,
+        'date': DjangoJSONEncoder().default(message.date),
+        'user': message.user,
+        'room_id': message.room_id,
+    }
+
+
+async def abroadcast_message(message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    await channel_layer.group_send(room_group_name(message.room_id), {
+        'type': 'chat.message',
+        'message': message_to_dict(message),
+    })
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        self.group_name = room_group_name(self.scope['url_route']['kwargs']['room_id'])
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def chat_message(self, event):
+        await self.send_json(event['message'])
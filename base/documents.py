@@ -0,0 +1,146 @@
+import difflib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Document, DocumentRevision
+from .search import get_search_backend
+
+
+class PatchError(ValueError):
+    pass
+
+
+def apply_patches(text, patches):
+    """
+    Apply ``[{"start": i, "end": j, "text": "..."}, ...]`` to ``text`` in order.
+
+    Offsets count UTF-16 code units, the way JavaScript indexes strings, and
+    each patch is relative to the result of the ones before it.
+    """
+    data = text.encode('utf-16-le')
+    for patch in patches:
+        try:
+            start, end, insert = int(patch['start']), int(patch['end']), str(patch['text'])
+        except (KeyError, TypeError, ValueError):
+            raise PatchError(f'Malformed patch {patch!r}')
+        if not 0 <= start <= end <= len(data) // 2:
+            raise PatchError(f'Patch range {start}:{end} is out of bounds')
+        data = data[:start * 2] + insert.encode('utf-16-le') + data[end * 2:]
+    try:
+        return data.decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise PatchError('Patch splits a surrogate pair')
+
+
+def make_delta(source, target):
+    """
+    Line-based instructions that rebuild ``target`` from ``source``: ``[i, j]``
+    copies source lines ``i:j``, a string is inserted as is.
+    """
+    source_lines = source.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+
+    # Most saves touch a few lines; strip the shared ends before diffing.
+    prefix = 0
+    limit = min(len(source_lines), len(target_lines))
+    while prefix < limit and source_lines[prefix] == target_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and source_lines[len(source_lines) - 1 - suffix] == target_lines[len(target_lines) - 1 - suffix]):
+        suffix += 1
+
+    delta = [[0, prefix]] if prefix else []
+    matcher = difflib.SequenceMatcher(None, source_lines[prefix:len(source_lines) - suffix],
+                                      target_lines[prefix:len(target_lines) - suffix], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([prefix + i1, prefix + i2])
+        elif j1 < j2:
+            delta.append(''.join(target_lines[prefix + j1:prefix + j2]))
+    if suffix:
+        delta.append([len(source_lines) - suffix, len(source_lines)])
+    return delta
+
+
+def apply_delta(source, delta):
+    lines = source.splitlines(keepends=True)
+    return ''.join(''.join(lines[op[0]:op[1]]) if isinstance(op, list) else op for op in delta)
+
+
+def record_revision(document, content):
+    """
+    Store ``document`` as it was before ``content`` replaced it. Most versions
+    are kept as a compressed delta back from the next one; every
+    ``DOCUMENT_SNAPSHOT_INTERVAL``-th is a full snapshot, which bounds the
+    number of deltas applied to rebuild any version.
+    """
+    previous = document.content or ''
+    snapshot = document.version % getattr(settings, 'DOCUMENT_SNAPSHOT_INTERVAL', 10) == 0
+    payload = previous if snapshot else json.dumps(make_delta(content, previous), separators=(',', ':'))
+    DocumentRevision.objects.create(
+        document_id=document.pk,
+        version=document.version,
+        modified_at=document.modified_at,
+        snapshot=snapshot,
+        data=zlib.compress(payload.encode()),
+    )
+
+    keep = getattr(settings, 'DOCUMENT_REVISION_LIMIT', None)
+    if keep:
+        # Older versions are rebuilt from newer ones, never the other way round,
+        # so the tail of the chain can be dropped.
+        DocumentRevision.objects.filter(document_id=document.pk, version__lte=document.version - keep).delete()
+
+
+def update_document(document, content, title=None):
+    """
+    Replace the content of ``document`` (loaded with at least ``title``,
+    ``content``, ``version`` and ``modified_at``) unless someone saved it in
+    the meantime, and keep the old text as a revision. Returns the new
+    version, or None if the write was stale.
+    """
+    title = title or Document.make_title(content)
+    if content == (document.content or '') and title == document.title:
+        return document.version
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Document.objects.filter(pk=document.pk, version=document.version).update(
+            title=title, content=content, version=F('version') + 1, modified_at=now,
+        )
+        if not updated:
+            return None
+        record_revision(document, content)
+
+    document.title, document.content, document.modified_at = title, content, now
+    document.version += 1
+    get_search_backend().index(document)
+    return document.version
+
+
+def revision_content(document, version):
+    """
+    Rebuild the text of ``document`` at ``version``, starting from the nearest
+    newer snapshot or, failing that, the live content.
+    """
+    if version == document.version:
+        return document.content or ''
+    revisions = DocumentRevision.objects.filter(document_id=document.pk)
+    snapshot = revisions.filter(version__gte=version, snapshot=True).order_by('version') \
+        .values_list('version', flat=True).first()
+    upper = snapshot if snapshot is not None else document.version - 1
+    chain = list(revisions.filter(version__gte=version, version__lte=upper).order_by('-version')
+                 .values_list('version', 'snapshot', 'data'))
+    if len(chain) != upper - version + 1:
+        raise DocumentRevision.DoesNotExist(f'Version {version} of document {document.pk} is not stored')
+
+    text = document.content or ''
+    for _, is_snapshot, data in chain:
+        payload = zlib.decompress(data).decode()
+        text = payload if is_snapshot else apply_delta(text, json.loads(payload))
+    return text
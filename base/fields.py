@@ -0,0 +1,89 @@
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+# 0xff never occurs in UTF-8, so it cannot be confused with an uncompressed value.
+COMPRESSED_MARKER = b'\xff'
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Decode the stored bytes on first access and keep the text on the instance."""
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if instance is not None and isinstance(value, (bytes, memoryview)):
+            value = instance.__dict__[self.field.attname] = self.field.to_python(value)
+        return value
+
+    def __set__(self, instance, value):
+        # A data descriptor, so reads go through __get__ even once the value is in __dict__.
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """
+    Text kept in a binary column. Values of at least ``threshold`` UTF-8 bytes
+    (``COMPRESSED_TEXT_THRESHOLD`` by default) are zlib-compressed when that
+    makes them smaller; shorter ones are stored as plain UTF-8.
+
+    Model instances hold the stored bytes until the attribute is first read,
+    and write an untouched value back without recompressing it.
+    ``values()``/``values_list()`` return the stored bytes; decode them with
+    ``to_python()``.
+    """
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, threshold=None, level=6, **kwargs):
+        self.threshold = threshold
+        self.level = level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.threshold is not None:
+            kwargs['threshold'] = self.threshold
+        if self.level != 6:
+            kwargs['level'] = self.level
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def to_python(self, value):
+        if isinstance(value, memoryview):
+            value = bytes(value)
+        if isinstance(value, bytes):
+            if value.startswith(COMPRESSED_MARKER):
+                value = zlib.decompress(value[1:])
+            return value.decode()
+        return super().to_python(value)
+
+    def compress(self, text):
+        data = text.encode()
+        threshold = self.threshold
+        if threshold is None:
+            threshold = getattr(settings, 'COMPRESSED_TEXT_THRESHOLD', 1024)
+        if threshold is not None and len(data) >= threshold:
+            compressed = COMPRESSED_MARKER + zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return compressed
+        return data
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value)
+        return self.compress(super().get_prep_value(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
+
+    def pre_save(self, model_instance, add):
+        # Read around the descriptor so an unread value is not decompressed just to be saved.
+        return model_instance.__dict__.get(self.attname)
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Largest first: every size is thumbnailed from the same decoded image.
+PROFILE_IMAGE_SIZES = {
+    'full': (300, 300),
+    'feed': (128, 128),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PROFILE_IMAGE_WORKERS', 2),
+            thread_name_prefix='profile-image',
+        )
+    return _executor
+
+
+def file_hash(field_file):
+    digest = hashlib.sha256()
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_path(path, size):
+    """The file holding the ``size`` variant; ``full`` replaces the original."""
+    if size == 'full':
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{size}{ext}'
+
+
+def process_profile_image(path):
+    with Image.open(path) as img:
+        # Measured before draft(), which may already have shrunk the decoded image.
+        width, height = img.size
+        # For JPEGs, let the decoder downscale by a power of two up front.
+        img.draft(img.mode, PROFILE_IMAGE_SIZES['full'])
+        img.load()
+        for size, dimensions in PROFILE_IMAGE_SIZES.items():
+            if size == 'full' and width <= dimensions[0] and height <= dimensions[1]:
+                continue
+            variant = img.copy()
+            variant.thumbnail(dimensions)
+            variant.save(variant_path(path, size), format=img.format)
+
+
+def _process_logging_errors(path, on_done):
+    try:
+        process_profile_image(path)
+        if on_done is not None:
+            on_done()
+    except Exception:
+        logger.exception('Could not process profile image %s', path)
+    finally:
+        # Worker threads outlive the job; don't leave their connections open.
+        connections.close_all()
+
+
+def schedule_profile_image(path, on_done=None):
+    """Process ``path`` in the background, then call ``on_done`` once the variants exist."""
+    return get_executor().submit(_process_logging_errors, path, on_done)
@@ -0,0 +1,18 @@
+from base.benchmarks.common import BenchmarkCommand
+from base.benchmarks.concurrency import run_concurrency_benchmark
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare sync and async versions of the chat and task AJAX views under concurrent load in one process.'
+    file_database = True
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, action='append', dest='levels',
+                            help='Requests in flight at once; repeat for several (default: 1, 10, 50).')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per view and concurrency level.')
+        parser.add_argument('--wait', type=float, default=1.0, help='Long-poll timeout for getMessages (wait).')
+
+    def run(self, options):
+        return run_concurrency_benchmark(options['levels'] or [1, 10, 50], options['requests'], options['wait'],
+                                         log=self.stdout.write)
@@ -0,0 +1,27 @@
+from django.core.management.base import CommandError
+from django.db import connection
+
+from base.benchmarks.common import BenchmarkCommand
+from base.benchmarks.database import run_database_benchmark
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare SQLite journal settings under concurrent chat reads and writes, and persistent connections.'
+    # Journal modes only matter for a file that several connections share.
+    file_database = True
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--readers', type=int, default=8, help='Polling threads.')
+        parser.add_argument('--writers', type=int, default=1, help='Threads sending messages.')
+        parser.add_argument('--duration', type=float, default=3.0, help='Seconds per profile.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per CONN_MAX_AGE setting.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_database only applies to SQLite.')
+        super().handle(*args, **options)
+
+    def run(self, options):
+        return run_database_benchmark(options['readers'], options['writers'], options['duration'],
+                                      options['requests'], log=self.stdout.write)
@@ -0,0 +1,17 @@
+from base.benchmarks.common import BenchmarkCommand
+from base.benchmarks.revisions import run_revision_benchmark
+
+
+class Command(BenchmarkCommand):
+    help = 'Measure document revision storage and rebuild time for several snapshot intervals in a test database.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--interval', type=int, action='append', dest='intervals',
+                            help='Snapshot every N versions; repeat for several (default: 1, 5, 10, 25, 50).')
+        parser.add_argument('--edits', type=int, default=200, help='Saves to make per interval.')
+        parser.add_argument('--lines', type=int, default=200, help='Lines in the starting note.')
+
+    def run(self, options):
+        return run_revision_benchmark(options['intervals'] or [1, 5, 10, 25, 50], options['edits'],
+                                      options['lines'], log=self.stdout.write)
@@ -0,0 +1,16 @@
+from base.benchmarks.common import BenchmarkCommand
+from base.benchmarks.storage import run_storage_benchmark
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare database size and read time of document and message bodies with and without compression.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--documents', type=int, default=300, help='Documents to create.')
+        parser.add_argument('--messages', type=int, default=5000, help='Chat messages to create.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed reads per measurement.')
+
+    def run(self, options):
+        return run_storage_benchmark(options['documents'], options['messages'], options['repeat'],
+                                     log=self.stdout.write)
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import CommandError
+
+from base.benchmarks.common import SCALES, BenchmarkCommand
+from base.benchmarks.views import run_benchmark, find_regressions
+
+
+class Command(BenchmarkCommand):
+    help = 'Seed synthetic data in a test database and record queries, time and size for every base/ view.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--scale', action='append', choices=list(SCALES), dest='scales',
+                            help='Dataset size to run; repeat for several (default: small).')
+        parser.add_argument('--repeat', type=int, default=3, help='Warm requests per view.')
+        parser.add_argument('--baseline', help='Compare against this JSON report and fail on regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown of the median time.')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Ignore slowdowns smaller than this many milliseconds.')
+
+    def run(self, options):
+        return run_benchmark(options['scales'] or ['small'], options['repeat'], log=self.stdout.write)
+
+    def finish(self, report, options):
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = find_regressions(report, json.load(f), options['tolerance'],
+                                               options['min_delta_ms'])
+            report['regressions'] = regressions
+
+        super().finish(report, options)
+
+        for regression in regressions:
+            self.stderr.write('{scale} {view}: {metric} {baseline} -> {current}'.format(**regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
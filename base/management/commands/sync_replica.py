@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.replicas import replica_database, sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the read replica (a local stand-in for real replication).'
+
+    def handle(self, *args, **options):
+        if not replica_database():
+            raise CommandError('No replica configured; set DB_REPLICA_NAME.')
+        sync_replica()
+        self.stdout.write(f'Copied default to {replica_database()}')
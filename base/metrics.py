@@ -0,0 +1,116 @@
+"""Per-request performance counters and the in-process metrics registry."""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_request = contextvars.ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_start = None
+        self._template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    @contextmanager
+    def timing_template(self):
+        # Templates rendered from inside another template are already counted.
+        self._template_depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                self.template_time += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection: counts the query toward the
+    request being served, whichever thread (async views use several) runs it.
+    """
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+class MetricsRegistry:
+    """Cumulative per-view counters and a latency histogram, safe across threads."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, duration, metrics, response_bytes):
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                    'queries': 0, 'db': 0.0, 'template': 0.0, 'bytes': 0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    entry['buckets'][i] += 1
+            entry['count'] += 1
+            entry['sum'] += duration
+            entry['queries'] += metrics.queries
+            entry['db'] += metrics.db_time
+            entry['template'] += metrics.template_time
+            entry['bytes'] += response_bytes
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            views = {view: dict(entry, buckets=list(entry['buckets'])) for view, entry in self._views.items()}
+
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by URL name.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for view, entry in sorted(views.items()):
+            label = _escape(view)
+            for bound, count in zip(self.buckets, entry['buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{view="{label}"}} {entry["sum"]}')
+            lines.append(f'http_request_duration_seconds_count{{view="{label}"}} {entry["count"]}')
+
+        for name, key, help_text in (
+            ('http_request_db_queries_total', 'queries', 'Database queries issued.'),
+            ('http_request_db_seconds_total', 'db', 'Time spent in SQL.'),
+            ('http_request_template_seconds_total', 'template', 'Time spent rendering templates.'),
+            ('http_response_bytes_total', 'bytes', 'Response body bytes.'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for view, entry in sorted(views.items()):
+                lines.append(f'{name}{{view="{_escape(view)}"}} {entry[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics import RequestMetrics, current_request, registry
+from .replicas import RouteState, current_route, replica_database
+
+logger = logging.getLogger('base.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Measure query count, SQL time, template time, view time and response size
+    for every request. The numbers go out as a ``Server-Timing`` header and a
+    log line, and feed the per-view histograms served at ``/metrics``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Same marker Django's MiddlewareMixin uses, so the handler awaits us
+            # instead of running the whole chain in a thread.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        end = time.perf_counter()
+
+        total = end - start
+        view = end - metrics.view_start - metrics.template_time if metrics.view_start else 0.0
+        response_bytes = 0 if response.streaming else len(response.content)
+        match = request.resolver_match
+        view_name = match.view_name if match else '<unresolved>'
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.2f}',
+            f'view;dur={view * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        registry.observe(view_name, total, metrics, response_bytes)
+        logger.info(
+            'request method=%s path=%s view=%s status=%s total_ms=%.2f view_ms=%.2f db_ms=%.2f '
+            'queries=%d template_ms=%.2f bytes=%d',
+            request.method, request.path, view_name, response.status_code, total * 1000, view * 1000,
+            metrics.db_time * 1000, metrics.queries, metrics.template_time * 1000, response_bytes,
+            extra={
+                'view': view_name, 'status': response.status_code, 'total_ms': total * 1000,
+                'view_ms': view * 1000, 'db_ms': metrics.db_time * 1000, 'queries': metrics.queries,
+                'template_ms': metrics.template_time * 1000, 'bytes': response_bytes,
+            },
+        )
+        return response
+
+    @staticmethod
+    def mark_view_start():
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.view_start = time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.mark_view_start()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.mark_view_start()
+
+
+REPLICA_STICKY_SESSION_KEY = '_db_primary_until'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Send reads of views marked with ``base.replicas.use_replica`` to the
+    replica, unless this session wrote something in the last
+    ``REPLICA_STICKY_SECONDS``. Must come after the session middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = RouteState()
+        token = current_route.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_route.reset(token)
+        if state.wrote:
+            self.stick_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        state = RouteState()
+        token = current_route.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_route.reset(token)
+        if state.wrote:
+            await sync_to_async(self.stick_to_primary)(request)
+        return response
+
+    @staticmethod
+    def wants_replica(view_func):
+        return getattr(view_func, 'use_replica', False) or \
+            getattr(getattr(view_func, 'view_class', None), 'use_replica', False)
+
+    @staticmethod
+    def stick_to_primary(request):
+        if replica_database() and hasattr(request, 'session'):
+            request.session[REPLICA_STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_route.get()
+        if state is None or not replica_database() or not self.wants_replica(view_func):
+            return
+        sticky_until = request.session.get(REPLICA_STICKY_SESSION_KEY, 0) if hasattr(request, 'session') else 0
+        state.use_replica = sticky_until < time.time()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if replica_database() and self.wants_replica(view_func):
+            # Reading the session may hit the database.
+            await sync_to_async(ReplicaRoutingMiddleware.process_view)(self, request, view_func, view_args,
+                                                                       view_kwargs)
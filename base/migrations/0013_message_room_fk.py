@@ -0,0 +1,24 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_message_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='room_fk',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='base.room'),
+        ),
+        migrations.AlterField(
+            model_name='room',
+            name='name',
+            field=models.CharField(db_index=True, max_length=1000),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def forwards(apps, schema_editor):
+    Room = apps.get_model('base', 'Room')
+    Message = apps.get_model('base', 'Message')
+    for room_id in Room.objects.values_list('id', flat=True):
+        Message.objects.filter(room=str(room_id)).update(room_fk_id=room_id)
+    # Messages pointing at rooms that no longer exist could never be shown.
+    Message.objects.filter(room_fk__isnull=True).delete()
+
+
+def backwards(apps, schema_editor):
+    Message = apps.get_model('base', 'Message')
+    for room_id in Message.objects.values_list('room_fk_id', flat=True).distinct():
+        Message.objects.filter(room_fk_id=room_id).update(room=str(room_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_message_room_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
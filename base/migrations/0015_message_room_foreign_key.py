@@ -0,0 +1,38 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_backfill_message_room_fk'),
+    ]
+
+    operations = [
+        # A default keeps the removal of the old column reversible.
+        migrations.AlterField(
+            model_name='message',
+            name='room',
+            field=models.CharField(default='', max_length=1000000),
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='room',
+        ),
+        migrations.RenameField(
+            model_name='message',
+            old_name='room_fk',
+            new_name='room',
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.room'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'date'], name='base_messag_room_id_fd9b73_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS base_search_index USING fts5(
+    owner_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# rowid = object id * 8 + type code, see base.search.SEARCH_TYPES.
+POPULATE_INDEX = [
+    "INSERT INTO base_search_index (rowid, owner_id, title, body) "
+    "SELECT id * 8 + 1, COALESCE(user_id, 0), title, COALESCE(description, '') FROM base_task",
+    "INSERT INTO base_search_index (rowid, owner_id, title, body) "
+    "SELECT id * 8 + 2, NULL, title, content FROM base_post",
+    "INSERT INTO base_search_index (rowid, owner_id, title, body) "
+    "SELECT id * 8 + 3, NULL, title, COALESCE(content, '') FROM base_document",
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    for statement in POPULATE_INDEX:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS base_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0016_profile_image_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
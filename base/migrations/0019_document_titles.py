@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def make_title(content):
+    for line in (content or '').splitlines():
+        if line.strip():
+            return line.strip()[:255]
+    return 'Untitled'
+
+
+def backfill_titles(apps, schema_editor):
+    # The editor never exposed the title, so most notes were saved without one.
+    Document = apps.get_model('base', 'Document')
+    for document in Document.objects.filter(title='').only('id', 'content').iterator():
+        Document.objects.filter(pk=document.pk).update(title=make_title(document.content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0018_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_titles, migrations.RunPython.noop),
+    ]
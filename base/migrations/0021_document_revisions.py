@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0020_document_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('modified_at', models.DateTimeField()),
+                ('snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='base.document')),
+            ],
+            options={
+                'ordering': ('-version',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentrevision',
+            constraint=models.UniqueConstraint(fields=('document', 'version'), name='document_revision_version_unique'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations, models
+
+import base.fields
+
+BATCH_SIZE = 500
+
+
+def copy_field(model, source, target):
+    batch = []
+    for obj in model.objects.only('id', source).iterator(chunk_size=BATCH_SIZE):
+        setattr(obj, target, getattr(obj, source))
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, [target])
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, [target])
+
+
+def forwards(apps, schema_editor):
+    copy_field(apps.get_model('base', 'Document'), 'content', 'content_compressed')
+    copy_field(apps.get_model('base', 'Message'), 'value', 'value_compressed')
+
+
+def backwards(apps, schema_editor):
+    copy_field(apps.get_model('base', 'Document'), 'content_compressed', 'content')
+    copy_field(apps.get_model('base', 'Message'), 'value_compressed', 'value')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_document_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_compressed',
+            field=base.fields.CompressedTextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='value_compressed',
+            field=base.fields.CompressedTextField(max_length=1000000, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+        # A default keeps the removal of the old column reversible.
+        migrations.AlterField(
+            model_name='message',
+            name='value',
+            field=models.CharField(default='', max_length=1000000),
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='content',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='value',
+        ),
+        migrations.RenameField(
+            model_name='document',
+            old_name='content_compressed',
+            new_name='content',
+        ),
+        migrations.RenameField(
+            model_name='message',
+            old_name='value_compressed',
+            new_name='value',
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='value',
+            field=base.fields.CompressedTextField(max_length=1000000),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_date_posted(apps, schema_editor):
+    Post = apps.get_model('base', 'Post')
+    Post.objects.using(schema_editor.connection.alias).update(modified_at=F('date_posted'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0022_compressed_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_date_posted, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='document',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0023_modified_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-date_posted', 'id'], name='post_date_posted_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+from base.images import variant_path
+
+
+def flag_existing_variants(apps, schema_editor):
+    # Pictures processed before the flag existed: check storage once here instead of per request.
+    Profile = apps.get_model('base', 'Profile')
+    ready = [
+        profile.pk
+        for profile in Profile.objects.using(schema_editor.connection.alias).only('image')
+        if profile.image and profile.image.storage.exists(variant_path(profile.image.name, 'feed'))
+    ]
+    Profile.objects.using(schema_editor.connection.alias).filter(pk__in=ready).update(image_variants_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0024_post_date_posted_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_variants_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(flag_existing_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# Code 3 is Document in base.search.SEARCH_TYPES; rowid = object id * 8 + code.
+DOCUMENT_CODE = 3
+
+
+def reindex_documents(apps, schema_editor):
+    # 0017 indexed documents before 0019 backfilled their titles.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Document = apps.get_model('base', 'Document')
+    rows = [
+        (document.pk * 8 + DOCUMENT_CODE, None, document.title or '', document.content or '')
+        for document in Document.objects.using(connection.alias).only('title', 'content').iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM base_search_index WHERE rowid %% 8 = %s', [DOCUMENT_CODE])
+        cursor.executemany('INSERT INTO base_search_index (rowid, owner_id, title, body) VALUES (%s, %s, %s, %s)',
+                           rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_document_titles'),
+        ('base', '0025_profile_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_documents, migrations.RunPython.noop),
+    ]
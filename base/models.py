@@ -1,14 +1,67 @@
 import django.utils.timezone
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Q, Value, When
 from django.contrib.auth.models import User
-from datetime import datetime, date
+from django.dispatch import Signal
+from datetime import datetime, date, timedelta
+from functools import partial
 from django.utils.timezone import make_aware, is_aware
-from PIL import Image
+from .fields import CompressedTextField
+from .images import file_hash, schedule_profile_image, variant_path
 from django.urls import reverse
 from django.utils import timezone
 
 
+def supports_update_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+class TaskQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(complete=False)
+
+    def overlapping(self, start, end):
+        """
+        Tasks shown on some day in ``[start, end]`` (midnights): those running
+        through one of them, and those without a deadline created on one of
+        those dates. Unordered so the deadline index drives the scan.
+        """
+        return self.filter(
+            Q(deadline__gte=start, created__lte=end)
+            | Q(deadline__isnull=True, created__gte=start, created__lt=end + timedelta(days=1))
+        ).order_by()
+
+    def toggle_complete(self, pk, user):
+        """
+        Flip ``complete`` for the user's task in a single UPDATE and return
+        the new value, or None if the user has no such task.
+        """
+        # Route as a write: self.db is the read alias, and only db_for_write
+        # tells the replica router that this request now has to read its writes.
+        db = self._db or router.db_for_write(self.model, **self._hints)
+        connection = connections[db]
+        if supports_update_returning(connection):
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET complete = NOT complete WHERE id = %s AND user_id = %s RETURNING complete',
+                    [pk, user.pk],
+                )
+                row = cursor.fetchone()
+            return bool(row[0]) if row else None
+
+        with transaction.atomic(using=db):
+            toggled = self.using(db).filter(pk=pk, user=user).update(
+                complete=Case(When(complete=True, then=Value(False)), default=Value(True)),
+            )
+            if not toggled:
+                return None
+            return self.using(db).filter(pk=pk).values_list('complete', flat=True).get()
+
+
 class Task(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     title = models.CharField(max_length=200)
@@ -17,75 +70,215 @@ class Task(models.Model):
     created = models.DateTimeField(auto_now_add=False, auto_now=False, blank=True, null=True)
     deadline = models.DateTimeField(auto_now_add=False, auto_now=False, blank=True, null=True)
 
-    def save(self, *args, **kwargs):
-        from dateutil import parser
-        deadline = parser.parse(str(self.deadline))
-        now = datetime.now()
+    objects = TaskQuerySet.as_manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_deadline = instance.__dict__.get('deadline')
+        return instance
+
+    def validate_deadline(self):
+        """Reject a new or changed deadline that lies in the past."""
+        if self.deadline is None:
+            return
+        if hasattr(self, '_loaded_deadline') and self.deadline == self._loaded_deadline:
+            return
+        deadline = self._meta.get_field('deadline').to_python(self.deadline)
         if not is_aware(deadline):
             deadline = make_aware(deadline)
-        if not is_aware(now):
-            now = make_aware(now)
+        if deadline < timezone.now():
+            raise ValidationError({'deadline': 'The date cannot be in the past!'})
+
+    def clean(self):
+        super().clean()
+        self.validate_deadline()
 
-        if deadline < now:
-            raise ValidationError("The date cannot be in the past!")
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'deadline' in update_fields:
+            self.validate_deadline()
         super(Task, self).save(*args, **kwargs)
+        self._loaded_deadline = self.deadline
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Task list pages: keyset on (-created, id) per user.
+            models.Index(fields=['user', '-created', 'id'], name='task_user_created_idx'),
+            # Open-task count. Django compiles complete=False to NOT complete,
+            # which a partial index with the same condition can serve.
+            models.Index(fields=['user'], condition=Q(complete=False), name='task_user_open_idx'),
+            # Calendar month range: deadline >= first day, created <= last day.
+            models.Index(fields=['user', 'deadline', 'created'], name='task_user_deadline_idx'),
+        ]
+
+
+# Sent from the image worker once the variants of a new profile picture are written.
+profile_image_processed = Signal()
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     image = models.ImageField(default='default.jpg', upload_to='profile_pics')
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_variants_ready = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return f'{self.user.username} Profile'
 
+    def image_variant_url(self, size):
+        """URL of a resized copy from ``process_profile_image``, or of the original until it is written."""
+        if not self.image_variants_ready:
+            return self.image.url
+        return self.image.storage.url(variant_path(self.image.name, size))
+
+    @property
+    def feed_image_url(self):
+        return self.image_variant_url('feed')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+
+    def _field_value(self, field):
+        value = getattr(self, field.attname)
+        return value.name if isinstance(field, models.FileField) else value
+
+    def _take_snapshot(self):
+        self._loaded_values = {
+            field.name: self._field_value(field)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """Names of fields changed since the last load or save, or None if unknown."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = [name for name, value in loaded.items()
+                 if self._field_value(self._meta.get_field(name)) != value]
+        if self.image and not self.image._committed and 'image' not in dirty:
+            dirty.append('image')
+        return dirty
+
     def save(self, *args, **kwargs):
+        process = False
+        if self.image and not self.image._committed:
+            digest = file_hash(self.image)
+            loaded_name = getattr(self, '_loaded_values', {}).get('image')
+            if digest == self.image_hash and loaded_name:
+                # The same picture was uploaded again; keep the processed file.
+                self.image = loaded_name
+            else:
+                self.image_hash = digest
+                self.image_variants_ready = False
+                process = True
+
+        if self.pk and not args and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                kwargs['update_fields'] = dirty
+
         super(Profile, self).save(*args, **kwargs)
+        self._take_snapshot()
+
+        if process:
+            path = self.image.path
+            on_done = partial(profile_image_processed.send, sender=Profile, pk=self.pk, name=self.image.name)
+            transaction.on_commit(lambda: schedule_profile_image(path, on_done=on_done))
 
-        img = Image.open(self.image.path)
 
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Posts with the author and profile joined in, pruned to the columns the feed renders."""
+        return self.select_related('author__profile').only(
+            'title', 'content', 'date_posted',
+            'author__username',
+            'author__profile__image',
+            'author__profile__image_variants_ready',
+        ).order_by('-date_posted')
 
 
 class Post(models.Model):
     title = models.CharField(max_length=100)
     content = models.TextField()
     date_posted = models.DateTimeField(default=timezone.now)
+    # Set on every save, edits included; the feed's Last-Modified is the newest one.
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.pk})
 
+    class Meta:
+        indexes = [
+            # Feed pages: keyset on (-date_posted, id).
+            models.Index(fields=['-date_posted', 'id'], name='post_date_posted_idx'),
+        ]
+
 
 class Document(models.Model):
     title = models.CharField(max_length=255)
-    content = models.TextField(blank=True, null=True)
+    content = CompressedTextField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
-    modified_at = models.DateTimeField(auto_now=True)
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Bumped on every content change; autosave patches must name the version they apply to.
+    version = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ('title',)
 
+    @classmethod
+    def make_title(cls, content):
+        """The first non-blank line of ``content``, so sidebars never need the body."""
+        for line in (content or '').splitlines():
+            if line.strip():
+                return line.strip()[:cls._meta.get_field('title').max_length]
+        return 'Untitled'
+
+
+class DocumentRevision(models.Model):
+    """An earlier version of a document, stored compactly by ``base.documents.record_revision``."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='revisions')
+    version = models.PositiveIntegerField()
+    modified_at = models.DateTimeField()
+    # Full compressed text if set, otherwise a compressed delta from version + 1.
+    snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ('-version',)
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'version'], name='document_revision_version_unique'),
+        ]
+
 
 class Room(models.Model):
-    name = models.CharField(max_length=1000)
+    name = models.CharField(max_length=1000, db_index=True)
 
 
 class Message(models.Model):
-    value = models.CharField(max_length=1000000)
+    value = CompressedTextField(max_length=1000000)
     date = models.DateTimeField(default=datetime.now, blank=True)
     user = models.CharField(max_length=1000000)
-    room = models.CharField(max_length=1000000)
\ No newline at end of file
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date']),
+        ]
@@ -0,0 +1,58 @@
+import base64
+import binascii
+
+from django.utils.dateparse import parse_datetime
+
+PAGE_SIZE = 20
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat() if value is not None else ""}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        pk = int(pk)
+        # Well formed but out of range, e.g. month 13, raises ValueError.
+        parsed = parse_datetime(value) if value else None
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if value and parsed is None:
+        raise InvalidCursor(cursor)
+    return parsed, pk
+
+
+def keyset_page(queryset, field, cursor=None, page_size=PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)`` for the page of ``queryset`` ordered by
+    ``(-field, id)`` that follows ``cursor``; ``next_cursor`` is None on the
+    final page.
+
+    The cursor is a single range bound, so an index on ``(-field, id)`` seeks
+    straight to the page. Rows where ``field`` is NULL come last, paged by id
+    in a second phase once the others run out.
+    """
+    value, pk = decode_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if not cursor or value is not None:
+        ranked = queryset.filter(**{f'{field}__isnull': False}).order_by(f'-{field}', 'id')
+        if cursor:
+            ranked = ranked.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'id__lte': pk})
+        rows = list(ranked[:page_size + 1])
+
+    if len(rows) <= page_size and queryset.model._meta.get_field(field).null:
+        unranked = queryset.filter(**{f'{field}__isnull': True}).order_by('id')
+        if cursor and value is None:
+            unranked = unranked.filter(id__gt=pk)
+        rows += unranked[:page_size + 1 - len(rows)]
+
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(getattr(rows[-1], field), rows[-1].pk)
@@ -0,0 +1,64 @@
+"""
+Primary/replica routing. Views marked with ``use_replica`` read from
+``settings.REPLICA_DATABASE``; writes, and every request in the
+``REPLICA_STICKY_SECONDS`` after one of the session's writes, use the primary.
+"""
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set per request by ReplicaRoutingMiddleware.
+current_route = contextvars.ContextVar('current_db_route', default=None)
+
+# Small lookups whose staleness would log users out or lose their session.
+PRIMARY_ONLY_APPS = {'auth', 'sessions'}
+
+
+class RouteState:
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def use_replica(view):
+    """Mark a view, or a class-based view, as safe to serve from the replica."""
+    view.use_replica = True
+    return view
+
+
+def replica_database():
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_route.get()
+        if state is not None and state.use_replica and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return replica_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_route.get()
+        if state is not None and model._meta.app_label != 'sessions':
+            # Read your own write for the rest of this request, and the next few.
+            state.wrote = True
+            state.use_replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, schema included.
+        return db == DEFAULT_DB_ALIAS
+
+
+def sync_replica(source=DEFAULT_DB_ALIAS, target=None):
+    """Copy the primary SQLite database over the replica with the online backup API."""
+    target = target or replica_database()
+    for alias in (source, target):
+        connections[alias].ensure_connection()
+    connections[source].connection.backup(connections[target].connection)
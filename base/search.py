@@ -0,0 +1,191 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .fields import CompressedTextField
+from .models import Task, Post, Document
+
+SearchType = namedtuple('SearchType', 'kind code model title_field body_field owner_field')
+
+# ``code`` is packed into the index rowid (object id * 8 + code), so every
+# entry can be addressed without a secondary lookup.
+SEARCH_TYPES = [
+    SearchType('task', 1, Task, 'title', 'description', 'user_id'),
+    SearchType('post', 2, Post, 'title', 'content', None),
+    SearchType('document', 3, Document, 'title', 'content', None),
+]
+SEARCH_TYPES_BY_KIND = {search_type.kind: search_type for search_type in SEARCH_TYPES}
+SEARCH_TYPES_BY_MODEL = {search_type.model: search_type for search_type in SEARCH_TYPES}
+SEARCH_TYPES_BY_CODE = {search_type.code: search_type for search_type in SEARCH_TYPES}
+
+FTS_TABLE = 'base_search_index'
+
+
+def result_url(kind, pk):
+    if kind == 'task':
+        return reverse('task-update', args=[pk])
+    if kind == 'post':
+        return reverse('post-detail', args=[pk])
+    return reverse('editor') + f'?docid={pk}'
+
+
+class BaseSearchBackend:
+    def index(self, instance):
+        pass
+
+    def remove(self, instance):
+        pass
+
+    def index_many(self, instances):
+        for instance in instances:
+            self.index(instance)
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, user=None, kinds=None, limit=20):
+        """Return ranked ``{'type', 'id', 'title', 'snippet', 'url'}`` dicts."""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, kind, query):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    LIKE-based fallback for databases without a full-text index. Compressed
+    bodies (documents) cannot be matched in SQL, so only their titles are.
+    """
+
+    def _filter(self, queryset, search_type, query):
+        terms = query.split()
+        body_searchable = not isinstance(search_type.model._meta.get_field(search_type.body_field),
+                                         CompressedTextField)
+        for term in terms:
+            condition = Q(**{f'{search_type.title_field}__icontains': term})
+            if body_searchable:
+                condition |= Q(**{f'{search_type.body_field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset if terms else queryset.none()
+
+    def filter_queryset(self, queryset, kind, query):
+        return self._filter(queryset, SEARCH_TYPES_BY_KIND[kind], query)
+
+    def search(self, query, user=None, kinds=None, limit=20):
+        results = []
+        for search_type in SEARCH_TYPES:
+            if kinds and search_type.kind not in kinds:
+                continue
+            queryset = search_type.model.objects.all()
+            if search_type.owner_field:
+                if not (user and user.is_authenticated):
+                    continue
+                queryset = queryset.filter(**{search_type.owner_field: user.pk})
+            for obj in self._filter(queryset, search_type, query)[:limit]:
+                title = getattr(obj, search_type.title_field)
+                body = getattr(obj, search_type.body_field) or ''
+                in_title = all(term.lower() in title.lower() for term in query.split())
+                results.append((0 if in_title else 1, {
+                    'type': search_type.kind,
+                    'id': obj.pk,
+                    'title': title,
+                    'snippet': body[:120],
+                    'url': result_url(search_type.kind, obj.pk),
+                }))
+        results.sort(key=lambda result: result[0])
+        return [result for _, result in results[:limit]]
+
+
+class FTS5SearchBackend(BaseSearchBackend):
+    """SQLite FTS5 index kept in ``base_search_index`` and ranked with bm25."""
+
+    @staticmethod
+    def fts_query(query):
+        # Quote each word so user input can never be parsed as FTS syntax.
+        return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+    @staticmethod
+    def _row(search_type, instance):
+        owner = None
+        if search_type.owner_field:
+            owner = getattr(instance, search_type.owner_field) or 0
+        return (
+            instance.pk * 8 + search_type.code,
+            owner,
+            getattr(instance, search_type.title_field) or '',
+            getattr(instance, search_type.body_field) or '',
+        )
+
+    def index(self, instance):
+        row = self._row(SEARCH_TYPES_BY_MODEL[type(instance)], instance)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [row[0]])
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, owner_id, title, body) VALUES (%s, %s, %s, %s)', row)
+
+    def index_many(self, instances):
+        rows = [self._row(SEARCH_TYPES_BY_MODEL[type(instance)], instance) for instance in instances]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[row[0]] for row in rows])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, owner_id, title, body) VALUES (%s, %s, %s, %s)', rows)
+
+    def remove(self, instance):
+        search_type = SEARCH_TYPES_BY_MODEL[type(instance)]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [instance.pk * 8 + search_type.code])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for search_type in SEARCH_TYPES:
+                rows = (self._row(search_type, instance) for instance in search_type.model.objects.iterator())
+                cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, owner_id, title, body) VALUES (%s, %s, %s, %s)',
+                                   list(rows))
+
+    def filter_queryset(self, queryset, kind, query):
+        fts_query = self.fts_query(query)
+        if not fts_query:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid / 8 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid %% 8 = %s',
+            [fts_query, SEARCH_TYPES_BY_KIND[kind].code],
+        ))
+
+    def search(self, query, user=None, kinds=None, limit=20):
+        fts_query = self.fts_query(query)
+        if not fts_query:
+            return []
+        codes = [search_type.code for search_type in SEARCH_TYPES if not kinds or search_type.kind in kinds]
+        owner = user.pk if user and user.is_authenticated else -1
+        sql = (
+            f"SELECT rowid, title, snippet({FTS_TABLE}, 2, '', '', '...', 16) "
+            f'FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND (owner_id IS NULL OR owner_id = %s) '
+            f"AND rowid %% 8 IN ({', '.join(['%s'] * len(codes))}) "
+            f'ORDER BY bm25({FTS_TABLE}, 0.0, 10.0, 1.0) LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [fts_query, owner, *codes, limit])
+            rows = cursor.fetchall()
+        results = []
+        for rowid, title, snippet in rows:
+            kind = SEARCH_TYPES_BY_CODE[rowid % 8].kind
+            results.append({
+                'type': kind,
+                'id': rowid // 8,
+                'title': title,
+                'snippet': snippet,
+                'url': result_url(kind, rowid // 8),
+            })
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    return import_string(getattr(settings, 'SEARCH_BACKEND', 'base.search.FTS5SearchBackend'))()
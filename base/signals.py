@@ -1,7 +1,40 @@
-from django.db.models.signals import post_save
+import django
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, Task, Post, Document, profile_image_processed
+from .cache import invalidate_feed, invalidate_task_cache
+from .metrics import record_query
+from .search import get_search_backend
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        # In front, so execute_wrapper() blocks that are open right now still pop their own entry.
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+if django.VERSION < (4, 1):
+    @receiver(request_started)
+    def check_connection_health(sender, **kwargs):
+        """Drop persistent connections that went away, like CONN_HEALTH_CHECKS does from Django 4.1."""
+        for connection in connections.all():
+            if (connection.settings_dict.get('CONN_HEALTH_CHECKS') and connection.connection is not None
+                    and not connection.is_usable()):
+                connection.close()
 
 
 @receiver(post_save, sender=User)
@@ -12,6 +45,41 @@ def create_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    # Only a profile loaded through this user can carry unsaved changes.
+    if User.profile.is_cached(instance):
+        instance.profile.save()
+
+    #212e213123
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def clear_feed(sender, **kwargs):
+    # The feed shows author names and profile pictures next to every post.
+    invalidate_feed()
+
+
+@receiver(profile_image_processed)
+def mark_image_variants_ready(sender, pk, name, **kwargs):
+    # Only flag the upload that was processed, not a newer one saved meanwhile.
+    if Profile.objects.filter(pk=pk, image=name).update(image_variants_ready=True):
+        invalidate_feed()
+
+
+@receiver([post_save, post_delete], sender=Task)
+def clear_task_cache(sender, instance, **kwargs):
+    invalidate_task_cache(instance.user_id)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Document)
+def update_search_index(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
 
-    #212e213123
\ No newline at end of file
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Document)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance)
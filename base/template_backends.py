@@ -0,0 +1,26 @@
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .metrics import current_request
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_request.get()
+        if metrics is None:
+            return super().render(context, request)
+        with metrics.timing_template():
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, reporting render time to PerformanceMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -1,5 +1,726 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import make_aware
+from PIL import Image
 
-#git clone
+from .benchmarks.views import run_benchmark, find_regressions
+from .cache import get_open_task_count
+from .images import process_profile_image, variant_path
+from .pagination import encode_cursor, keyset_page
+from .documents import revision_content, update_document
+from .replicas import RouteState, current_route, sync_replica
+from .views import MESSAGES_MAX_PAGE_SIZE, TASK_BULK_MAX_SIZE, get_tasks_for_month
+from .models import (
+    Document, DocumentRevision, Message, Post, Profile, Room, Task, profile_image_processed, supports_update_returning,
+)
+
+
+class PostFeedQueryTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='password')
+
+    def feed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog-home'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_query_count_is_constant(self):
+        Post.objects.create(title='first', content='content', author=self.author)
+        baseline = self.feed_queries()
+
+        other = User.objects.create_user('other', password='password')
+        for i in range(10):
+            Post.objects.create(title=f'post {i}', content='content', author=other if i % 2 else self.author)
+
+        self.assertEqual(self.feed_queries(), baseline)
+        # The conditional GET validators, then the page itself.
+        self.assertEqual(baseline, 2)
+
+
+class ProfileSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+
+    def test_login_does_not_touch_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'user', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([q['sql'] for q in queries if 'base_profile' in q['sql']])
+
+    def test_unchanged_profile_save_is_skipped(self):
+        profile = Profile.objects.get(user=self.user)
+        with self.assertNumQueries(0):
+            profile.save()
+
+    def test_profile_save_writes_only_changed_fields(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.image = 'profile_pics/other.jpg'
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"image"', updates[0])
+        self.assertNotIn('"user_id"', updates[0])
+        self.assertNotIn('"image_hash"', updates[0])
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings = self.settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.mkdir(os.path.join(self.media, 'profile_pics'))
+
+    def make_image(self, size):
+        path = os.path.join(self.media, 'profile_pics', 'me.jpg')
+        Image.new('RGB', size, 'red').save(path, format='JPEG')
+        return path
+
+    def test_large_jpeg_is_resized(self):
+        path = self.make_image((600, 600))
+        process_profile_image(path)
+        with Image.open(path) as full, Image.open(path.replace('.jpg', '_feed.jpg')) as feed:
+            self.assertEqual(full.size, (300, 300))
+            self.assertEqual(feed.size, (128, 128))
+
+    def test_small_image_is_kept(self):
+        path = self.make_image((200, 200))
+        with open(path, 'rb') as f:
+            original = f.read()
+        process_profile_image(path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+    def test_feed_uses_the_variant_once_written(self):
+        profile = User.objects.create_user('user', password='password').profile
+        with open(self.make_image((600, 600)), 'rb') as f:
+            profile.image = SimpleUploadedFile('me.jpg', f.read(), content_type='image/jpeg')
+
+        def process_now(path, on_done):
+            process_profile_image(path)
+            on_done()
+
+        with mock.patch('base.models.schedule_profile_image', side_effect=process_now):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                profile.save()
+            self.assertFalse(profile.image_variants_ready)
+            self.assertEqual(profile.feed_image_url, profile.image.url)
+            callbacks[0]()
+        profile.refresh_from_db()
+        self.assertTrue(profile.image_variants_ready)
+        self.assertEqual(profile.feed_image_url, profile.image.storage.url(variant_path(profile.image.name, 'feed')))
+
+    def test_feed_image_url_does_not_touch_storage(self):
+        profile = User.objects.create_user('user', password='password').profile
+        with mock.patch('django.core.files.storage.FileSystemStorage.exists') as exists:
+            profile.feed_image_url
+            profile.image_variants_ready = True
+            profile.feed_image_url
+        exists.assert_not_called()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class TaskIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+
+    def assertKeysetSeeks(self, queryset, field, index_name):
+        with CaptureQueriesContext(connection) as queries:
+            keyset_page(queryset, field, encode_cursor(timezone.now(), 1))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_task_list_uses_created_index(self):
+        self.assertKeysetSeeks(Task.objects.filter(user=self.user), 'created', 'task_user_created_idx')
+
+    def test_feed_uses_date_posted_index(self):
+        self.assertKeysetSeeks(Post.objects.for_feed(), 'date_posted', 'post_date_posted_idx')
+
+    def test_open_count_uses_partial_index(self):
+        self.assertUsesIndex(Task.objects.filter(user=self.user).open().order_by(), 'task_user_open_idx')
+
+    def test_calendar_uses_deadline_index(self):
+        start, end = make_aware(datetime(2030, 1, 1)), make_aware(datetime(2030, 1, 31))
+        tasks = Task.objects.overlapping(start, end).filter(user=self.user)
+        self.assertUsesIndex(tasks, 'task_user_deadline_idx')
+
+
+class ToggleCompleteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+        self.task = Task.objects.create(user=self.user, title='Task')
+
+    def check_toggles(self):
+        self.assertIs(Task.objects.toggle_complete(self.task.pk, self.user), True)
+        self.assertIs(Task.objects.toggle_complete(self.task.pk, self.user), False)
+        self.assertIs(Task.objects.toggle_complete(self.task.pk, self.user), True)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.complete)
+
+        other = User.objects.create_user('other', password='password')
+        self.assertIsNone(Task.objects.toggle_complete(self.task.pk, other))
+        self.assertIsNone(Task.objects.toggle_complete(self.task.pk + 1000, self.user))
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.complete)
+
+    @skipUnless(supports_update_returning(connection), 'UPDATE ... RETURNING is not supported')
+    def test_returning(self):
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.toggle_complete(self.task.pk, self.user)
+        self.assertEqual(len(queries), 1)
+        Task.objects.filter(pk=self.task.pk).update(complete=False)
+        self.check_toggles()
+
+    def test_fallback(self):
+        with mock.patch('base.models.supports_update_returning', return_value=False):
+            self.check_toggles()
+
+
+class TaskBulkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+        self.client.force_login(self.user)
+        self.deadline = make_aware(datetime(2040, 1, 1))
+        self.tasks = [Task.objects.create(user=self.user, title=f'Task {i}', deadline=self.deadline)
+                      for i in range(3)]
+        self.ids = [task.pk for task in self.tasks]
+
+    def bulk(self, **data):
+        return self.client.post(reverse('task-bulk'), json.dumps(data), content_type='application/json')
+
+    def test_complete_and_uncomplete(self):
+        self.assertEqual(self.bulk(operation='complete', ids=self.ids[:2]).json()['count'], 2)
+        self.assertEqual(Task.objects.filter(complete=True).count(), 2)
+        self.assertEqual(self.bulk(operation='uncomplete', ids=self.ids).json()['count'], 3)
+        self.assertFalse(Task.objects.filter(complete=True).exists())
+
+    def test_delete(self):
+        self.assertEqual(self.bulk(operation='delete', ids=self.ids[:2]).json()['count'], 2)
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), self.ids[2:])
+
+    def test_shift_deadline(self):
+        self.assertEqual(self.bulk(operation='shift_deadline', ids=self.ids, days=2).json()['count'], 3)
+        self.assertEqual(set(Task.objects.values_list('deadline', flat=True)), {self.deadline + timedelta(days=2)})
+
+    def test_create(self):
+        response = self.bulk(operation='create', tasks=[{'title': 'New'}, {'title': 'Newer'}])
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 5)
+
+    def test_other_users_tasks_are_untouched(self):
+        other = Task.objects.create(user=User.objects.create_user('other', password='password'), title='Theirs')
+        self.assertEqual(self.bulk(operation='delete', ids=[other.pk, self.ids[0]]).json()['count'], 1)
+        self.assertTrue(Task.objects.filter(pk=other.pk).exists())
+
+    def test_batch_cap(self):
+        response = self.bulk(operation='complete', ids=list(range(1, TASK_BULK_MAX_SIZE + 2)))
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_input(self):
+        for data in [
+            {'operation': 'complete', 'ids': str(self.ids[0])},
+            {'operation': 'complete', 'ids': [str(self.ids[0])]},
+            {'operation': 'create', 'tasks': 'New'},
+            {'operation': 'shift_deadline', 'ids': self.ids, 'days': 10 ** 9},
+            {'operation': 'shift_deadline', 'ids': self.ids, 'days': 3000000},
+            {'operation': 'shift_deadline', 'ids': self.ids, 'days': '2'},
+            {'operation': 'rename', 'ids': self.ids},
+        ]:
+            self.assertEqual(self.bulk(**data).status_code, 400, data)
+        self.assertEqual(self.client.post(reverse('task-bulk'), '[]', content_type='application/json').status_code,
+                         400)
+        self.assertFalse(Task.objects.filter(complete=True).exists())
+        self.assertEqual(set(Task.objects.values_list('deadline', flat=True)), {self.deadline})
+
+
+class TaskCacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.task = Task.objects.create(user=self.user, title='First')
+
+    def test_count_follows_saves_and_deletes(self):
+        self.assertEqual(get_open_task_count(self.user), 1)
+        Task.objects.create(user=self.user, title='Second')
+        self.assertEqual(get_open_task_count(self.user), 2)
+        self.task.complete = True
+        self.task.save()
+        self.assertEqual(get_open_task_count(self.user), 1)
+        Task.objects.filter(user=self.user).delete()
+        self.assertEqual(get_open_task_count(self.user), 0)
+
+    def test_task_list_follows_saves(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('tasks')), 'First')
+        self.task.title = 'Renamed'
+        self.task.save()
+        self.assertContains(self.client.get(reverse('tasks')), 'Renamed')
+
+    def test_other_users_are_untouched(self):
+        other = User.objects.create_user('other', password='password')
+        self.assertEqual(get_open_task_count(other), 0)
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.create(user=self.user, title='Second')
+            get_open_task_count(other)
+        self.assertEqual([q for q in queries if q['sql'].startswith('SELECT')], [])
+
+
+class TasksForMonthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+
+    def task(self, title, created, deadline=None):
+        return Task.objects.create(user=self.user, title=title, created=make_aware(created),
+                                   deadline=make_aware(deadline) if deadline else None)
+
+    def task_days(self, year, month):
+        return {entry['day'].day: [(item['task'].title, item['deadline']) for item in entry['tasks']]
+                for entry in get_tasks_for_month(year, month, user=self.user) if entry['tasks']}
+
+    def test_task_spanning_months(self):
+        self.task('Trip', datetime(2030, 1, 30, 12), datetime(2030, 2, 2, 9))
+        self.assertEqual(self.task_days(2030, 1), {31: [('Trip', False)]})
+        self.assertEqual(self.task_days(2030, 2), {1: [('Trip', False)], 2: [('Trip', True)]})
+
+    def test_task_without_deadline_is_on_its_created_day(self):
+        self.task('Someday', datetime(2030, 2, 10, 15))
+        self.assertEqual(self.task_days(2030, 2), {10: [('Someday', False)]})
+        self.assertEqual(self.task_days(2030, 1), {})
+
+    def test_day_lists_newest_first(self):
+        self.task('Older', datetime(2030, 2, 1), datetime(2030, 2, 3))
+        self.task('Undated', datetime(2030, 2, 2, 8))
+        self.task('Newer', datetime(2030, 2, 1, 6), datetime(2030, 2, 3))
+        self.assertEqual(self.task_days(2030, 2)[2], [('Undated', False), ('Newer', False), ('Older', False)])
+
+    def test_one_query(self):
+        for day in range(1, 6):
+            self.task(f'Task {day}', datetime(2030, 2, day), datetime(2030, 2, day + 3))
+        with self.assertNumQueries(1):
+            get_tasks_for_month(2030, 2, user=self.user)
+
+    def test_matches_the_per_day_lookup(self):
+        self.task('Trip', datetime(2030, 1, 30, 12), datetime(2030, 2, 2, 9))
+        self.task('Sprint', datetime(2030, 2, 3), datetime(2030, 2, 14, 18))
+        self.task('Errand', datetime(2030, 2, 14), datetime(2030, 2, 14))
+        days = get_tasks_for_month(2030, 2, user=self.user)
+        self.assertEqual(len(days), 28)
+        for i, entry in enumerate(days):
+            day = datetime(2030, 2, i + 1)
+            self.assertEqual(set(entry), {'tasks', 'day'})
+            self.assertEqual(entry['day'], day)
+            # What the old get_tasks_for_day returned, with the deadline compared by date.
+            expected = [{'task': task, 'deadline': task.deadline.date() == day.date()}
+                        for task in Task.objects.filter(user=self.user, deadline__gte=make_aware(day),
+                                                        created__lte=make_aware(day)).order_by('-created')]
+            self.assertEqual(entry['tasks'], expected, day)
+
+
+class TaskCalendarCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user', password='password')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.task = Task.objects.create(user=self.user, title='Dentist',
+                                        created=make_aware(datetime(now.year, now.month, now.day)),
+                                        deadline=now + timedelta(hours=1))
+
+    def test_grid_is_cached_until_a_task_changes(self):
+        self.assertContains(self.client.get(reverse('task-calendar-current')), 'Dentist')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('task-calendar-current'))
+        self.assertFalse([q for q in queries if 'base_task' in q['sql']])
+
+        self.task.title = 'Dentist at 9'
+        self.task.save()
+        self.assertContains(self.client.get(reverse('task-calendar-current')), 'Dentist at 9')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='password')
+
+    def walk(self, queryset, field, page_size=2):
+        pages, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(queryset, field, cursor, page_size=page_size)
+            pages.append([row.pk for row in rows])
+            if cursor is None:
+                return pages
+
+    def test_equal_timestamps_are_paged_by_id(self):
+        created = make_aware(datetime(2030, 1, 1))
+        ids = [Task.objects.create(user=self.user, title=str(i), created=created).pk for i in range(5)]
+        self.assertEqual(self.walk(Task.objects.all(), 'created'), [ids[0:2], ids[2:4], ids[4:]])
+
+    def test_null_rows_follow_the_dated_ones(self):
+        dated = [Task.objects.create(user=self.user, title=str(i), created=make_aware(datetime(2030, 1, i + 1))).pk
+                 for i in range(3)]
+        undated = [Task.objects.create(user=self.user, title='undated').pk for _ in range(3)]
+        pages = self.walk(Task.objects.all(), 'created')
+        self.assertEqual(pages, [dated[:0:-1], [dated[0], undated[0]], undated[1:]])
+
+    def test_bad_cursor_is_rejected(self):
+        self.client.force_login(self.user)
+        out_of_range = base64.urlsafe_b64encode(b'2020-13-45T00:00:00|1').decode()
+        for name in ('tasks-more', 'posts-more'):
+            for cursor in ('not-a-cursor', out_of_range):
+                response = self.client.get(reverse(name), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400, (name, cursor))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='password')
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['id']) for result in response.json()['results']]
+
+    def test_title_matches_rank_first(self):
+        in_body = Post.objects.create(title='Fruit', content='a banana a day', author=self.author)
+        in_title = Post.objects.create(title='Banana bread', content='flour', author=self.author)
+        self.assertEqual(self.search('banana'), [('post', in_title.pk), ('post', in_body.pk)])
+
+    def test_fts_syntax_is_escaped(self):
+        post = Post.objects.create(title='Banana bread', content='flour', author=self.author)
+        for query in ['"banana', 'banana*', '(banana)', '-banana']:
+            self.assertEqual(self.search(query), [('post', post.pk)], query)
+        # Operators and column filters are matched as plain words, never obeyed.
+        for query in ['banana OR rye', 'title:banana', '"', '*', '()', 'NEAR(']:
+            self.assertEqual(self.search(query), [], query)
+
+    def test_index_follows_updates_and_deletes(self):
+        post = Post.objects.create(title='Banana bread', content='flour', author=self.author)
+        post.title = 'Rye bread'
+        post.save()
+        self.assertEqual(self.search('banana'), [])
+        self.assertEqual(self.search('rye'), [('post', post.pk)])
+        post.delete()
+        self.assertEqual(self.search('rye'), [])
+
+    def test_tasks_are_scoped_to_their_owner(self):
+        task = Task.objects.create(user=self.author, title='Banana shopping')
+        self.assertEqual(self.search('banana'), [])
+        self.client.force_login(self.author)
+        self.assertEqual(self.search('banana', type='task'), [('task', task.pk)])
+        self.client.force_login(User.objects.create_user('other', password='password'))
+        self.assertEqual(self.search('banana'), [])
+
+
+class BenchmarkSmokeTests(TestCase):
+    def test_every_route_is_benchmarked(self):
+        report = run_benchmark(['tiny'], repeat=1)
+        tiny = report['scales']['tiny']
+        self.assertEqual(tiny['skipped'], [])
+        for name, result in tiny['views'].items():
+            self.assertLess(result['status'], 400, name)
+
+    def test_extra_queries_are_regressions(self):
+        report = run_benchmark(['tiny'], repeat=1)
+        baseline = json.loads(json.dumps(report))
+        baseline['scales']['tiny']['views']['blog-home']['queries'] -= 1
+        regressions = find_regressions(report, baseline)
+        self.assertEqual([(r['view'], r['metric']) for r in regressions], [('blog-home', 'queries')])
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def test_server_timing_header(self):
+        user = User.objects.create_user('user', password='password')
+        self.client.force_login(user)
+        response = self.client.get(reverse('tasks'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+
+    def test_metrics_are_admin_only(self):
+        self.client.get(reverse('blog-about'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+        admin = User.objects.create_superuser('admin', password='password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertContains(response, 'http_request_duration_seconds_count{view="blog-about"}')
+
+
+class DocumentAutosaveTests(TestCase):
+    def setUp(self):
+        self.document = Document.objects.create(title='Notes', content='Notes\nhello world')
+        self.url = reverse('autosave-document', args=[self.document.pk])
+
+    def autosave(self, version, patches):
+        return self.client.post(self.url, json.dumps({'version': version, 'patches': patches}),
+                                content_type='application/json')
+
+    def test_patch_applies_and_bumps_version(self):
+        response = self.autosave(1, [{'start': 12, 'end': 17, 'text': 'there'}])
+        self.assertEqual(response.json(), {'version': 2})
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.content, 'Notes\nhello there')
+        self.assertEqual(self.document.version, 2)
+
+    def test_stale_version_is_rejected(self):
+        self.autosave(1, [{'start': 0, 'end': 0, 'text': 'My '}])
+        response = self.autosave(1, [{'start': 0, 'end': 5, 'text': 'Todo'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.content, 'My Notes\nhello world')
+
+    def test_offsets_count_utf16_code_units(self):
+        Document.objects.filter(pk=self.document.pk).update(content='\U0001f600 ok')
+        # The emoji is two code units in JavaScript, so 'ok' starts at 3.
+        self.autosave(1, [{'start': 3, 'end': 5, 'text': 'done'}])
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.content, '\U0001f600 done')
+        self.assertEqual(self.autosave(2, [{'start': 1, 'end': 1, 'text': 'x'}]).status_code, 400)
+
+
+@override_settings(DOCUMENT_SNAPSHOT_INTERVAL=3)
+class DocumentRevisionTests(TestCase):
+    def setUp(self):
+        self.versions = ['Notes\n']
+        self.document = Document.objects.create(title='Notes', content=self.versions[0])
+        for i in range(7):
+            self.versions.append(self.versions[-1] + f'line {i}\n')
+            update_document(self.document, self.versions[-1])
+
+    def test_every_version_is_rebuilt(self):
+        self.assertEqual(self.document.version, 8)
+        self.assertEqual(list(DocumentRevision.objects.filter(snapshot=True).values_list('version', flat=True)),
+                         [6, 3])
+        for version, text in enumerate(self.versions, start=1):
+            self.assertEqual(revision_content(self.document, version), text)
+
+    def test_restore_saves_a_new_version(self):
+        url = reverse('restore-document-revision', args=[self.document.pk, 2])
+        self.assertEqual(self.client.post(url).json(), {'version': 9})
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.content, self.versions[1])
+        self.assertEqual(revision_content(self.document, 8), self.versions[-1])
+
+    @override_settings(DOCUMENT_REVISION_LIMIT=4)
+    def test_old_revisions_are_pruned(self):
+        update_document(self.document, 'Rewritten\n')
+        self.assertEqual(list(DocumentRevision.objects.values_list('version', flat=True)), [8, 7, 6, 5])
+        with self.assertRaises(DocumentRevision.DoesNotExist):
+            revision_content(self.document, 2)
+
+
+class CompressedTextFieldTests(TestCase):
+    def stored(self, document):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM base_document WHERE id = %s', [document.pk])
+            return bytes(cursor.fetchone()[0])
+
+    def test_large_values_are_compressed(self):
+        content = 'All work and no play makes Jack a dull boy.\n' * 100
+        document = Document.objects.create(title='Jack', content=content)
+        self.assertLess(len(self.stored(document)), len(content) // 10)
+        self.assertEqual(Document.objects.get(pk=document.pk).content, content)
+
+    def test_small_values_are_stored_as_utf8(self):
+        document = Document.objects.create(title='Short', content='caf\u00e9')
+        self.assertEqual(self.stored(document), 'caf\u00e9'.encode())
+        self.assertEqual(Document.objects.get(pk=document.pk).content, 'caf\u00e9')
+
+    def test_content_is_decoded_on_access(self):
+        document = Document.objects.create(title='Lazy', content='x' * 5000)
+        document = Document.objects.get(pk=document.pk)
+        self.assertIsInstance(document.__dict__['content'], bytes)
+        self.assertEqual(document.content, 'x' * 5000)
+        self.assertIsInstance(document.__dict__['content'], str)
+
+
+class GetMessagesTests(TestCase):
+    def setUp(self):
+        self.room = Room.objects.create(name='lobby')
+        self.message = Message.objects.create(value='hello', user='ann', room=self.room)
+        self.url = reverse('getMessages', args=['lobby'])
+
+    def add_messages(self, count):
+        return [Message.objects.create(value=f'm{i}', user='ann', room=self.room).pk for i in range(count)]
+
+    def page(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [m['id'] for m in data['messages']], data['has_more']
+
+    def test_latest_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual([m['value'] for m in response.json()['messages']], ['hello'])
+
+    def test_after_returns_only_newer_messages(self):
+        ids = self.add_messages(5)
+        self.assertEqual(self.page(after=ids[1]), (ids[2:], False))
+        self.assertEqual(self.page(after=ids[1], limit=2), (ids[2:4], True))
+        self.assertEqual(self.page(after=ids[-1]), ([], False))
+
+    def test_before_pages_backwards(self):
+        ids = [self.message.pk] + self.add_messages(5)
+        self.assertEqual(self.page(limit=2), (ids[4:], True))
+        self.assertEqual(self.page(before=ids[4], limit=2), (ids[2:4], True))
+        self.assertEqual(self.page(before=ids[2], limit=2), (ids[:2], False))
+
+    def test_limit_is_capped(self):
+        Message.objects.bulk_create(Message(value='m', user='ann', room=self.room)
+                                    for _ in range(MESSAGES_MAX_PAGE_SIZE))
+        ids, has_more = self.page(limit=MESSAGES_MAX_PAGE_SIZE * 5)
+        self.assertEqual(len(ids), MESSAGES_MAX_PAGE_SIZE)
+        self.assertTrue(has_more)
+
+    def test_invalid_parameters(self):
+        for params in ({'after': 'x'}, {'before': '1.5'}, {'limit': 'all'}, {'limit': 0}, {'wait': 'soon'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+    async def test_long_poll_times_out_empty(self):
+        start = time.perf_counter()
+        response = await self.async_client.get(self.url, {'after': self.message.pk, 'wait': 0.1})
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+        self.assertEqual(response.json(), {'messages': [], 'has_more': False})
+
+    def test_wsgi_does_not_wait(self):
+        start = time.perf_counter()
+        response = self.client.get(self.url, {'after': self.message.pk, 'wait': 5})
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(response.json(), {'messages': [], 'has_more': False})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='password')
+        self.post = Post.objects.create(title='First', content='body', author=self.author)
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get(reverse('blog-home'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        not_modified = self.revalidate(reverse('blog-home'))
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified['Last-Modified'], response['Last-Modified'])
+
+    def test_edited_post_changes_the_feed_etag(self):
+        etag = self.client.get(reverse('blog-home'))['ETag']
+        self.post.content = 'edited'
+        self.post.save()
+        response = self.client.get(reverse('blog-home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'edited')
+
+    def test_renamed_author_changes_the_feed_etag(self):
+        response = self.client.get(reverse('blog-home'))
+        self.author.username = 'renamed'
+        self.author.save()
+        revalidated = self.client.get(reverse('blog-home'), HTTP_IF_NONE_MATCH=response['ETag'],
+                                      HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertContains(revalidated, 'renamed')
+
+    def test_processed_picture_changes_the_feed_etag(self):
+        etag = self.client.get(reverse('blog-home'))['ETag']
+        profile = self.author.profile
+        profile_image_processed.send(sender=Profile, pk=profile.pk, name=profile.image.name)
+        profile.refresh_from_db()
+        self.assertTrue(profile.image_variants_ready)
+        response = self.client.get(reverse('blog-home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, profile.feed_image_url)
+
+    def test_editor_varies_on_cookie(self):
+        self.client.get(reverse('editor'))  # sets the CSRF cookie the page is tied to
+        response = self.revalidate(reverse('editor'))
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_messages_not_modified_until_a_new_one(self):
+        room = Room.objects.create(name='lobby')
+        url = reverse('getMessages', args=['lobby'])
+        Message.objects.create(value='hello', user='ann', room=room)
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len([q for q in queries if 'base_room' in q['sql']]), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len([q for q in queries if 'base_room' in q['sql']]), 1)
+        Message.objects.create(value='again', user='ann', room=room)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(REPLICA_DATABASE='replica', REPLICA_STICKY_SECONDS=60)
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('writer')
+        Post.objects.create(title='Synced post', content='...', author=self.user)
+        sync_replica()
+        self.client.force_login(self.user)
+
+    def feed_titles(self):
+        return [post.title for post in self.client.get(reverse('blog-home')).context['posts']]
+
+    def test_read_only_views_use_the_replica(self):
+        Post.objects.create(title='Not replicated yet', content='...', author=self.user)
+        self.assertEqual(self.feed_titles(), ['Synced post'])
+
+    def test_session_reads_its_own_writes(self):
+        self.client.post(reverse('post-create'), {'title': 'Fresh post', 'content': '...'})
+        self.assertEqual(self.feed_titles(), ['Fresh post', 'Synced post'])
+
+    def test_toggle_opens_the_sticky_window(self):
+        task = Task.objects.create(user=self.user, title='Task')
+        state = RouteState()
+        state.use_replica = True
+        token = current_route.set(state)
+        try:
+            self.assertIs(Task.objects.toggle_complete(task.pk, self.user), True)
+        finally:
+            current_route.reset(token)
+        self.assertTrue(state.wrote)
+        self.assertFalse(state.use_replica)
+
+        self.client.get(reverse('check_task', args=[task.pk]))
+        self.assertIn('_db_primary_until', self.client.session)
+
+    def test_cached_calendar_is_built_from_the_primary(self):
+        cache.clear()
+        now = timezone.now()
+        Task.objects.create(user=self.user, title='Not replicated yet',
+                            created=make_aware(datetime(now.year, now.month, now.day)),
+                            deadline=now + timedelta(hours=1))
+        self.assertContains(self.client.get(reverse('task-calendar-current')), 'Not replicated yet')
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_stickiness_expires(self):
+        self.client.post(reverse('post-create'), {'title': 'Fresh post', 'content': '...'})
+        self.assertEqual(self.feed_titles(), ['Synced post'])
@@ -16,22 +16,32 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(next_page='login'), name='logout'),
     path('register/', views.register, name='register'),
     path('', TaskList.as_view(), name='tasks'),
+    path('tasks-more', views.task_list_more, name='tasks-more'),
     path('task/<int:pk>/', TaskDetail.as_view(), name='task'),
     path('task-create/', TaskCreate.as_view(), name='task-create'),
     path('task-update/<int:pk>/', TaskUpdate.as_view(), name='task-update'),
     path('task-delete/<int:pk>/', DeleteView.as_view(), name='task-delete'),
     path('check_task/<int:task_id>', views.check_task, name="check_task"),
     path('task-create-ajax', views.task_create, name="task-create-ajax"),
+    path('task-bulk', views.task_bulk, name='task-bulk'),
     path('task-calendar', views.calendar_current_month, name='task-calendar-current'),
     path('task-calendar/<int:year>/<int:month>', views.task_calendar, name='task-calendar'),
     path('get-task-ajax/<int:task_id>', views.get_task_ajax, name='get-task-ajax'),
     path('profile/', views.profile, name='profile'),
     path('posts', PostListView.as_view(), name='blog-home'),
+    path('posts-more', views.post_list_more, name='posts-more'),
     path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('post/new/', PostCreateView.as_view(), name='post-create'),
     path('post/<int:pk>/update/', PostUpdateView.as_view(), name='post-update'),
     path('about/', views.about, name='blog-about'),
+    path('search', views.search, name='search'),
+    path('metrics', views.metrics, name='metrics'),
     path('editor/', views.editor, name='editor'),
+    path('editor/autosave/<int:docid>/', views.autosave_document, name='autosave-document'),
+    path('editor/<int:docid>/revisions/', views.document_revisions, name='document-revisions'),
+    path('editor/<int:docid>/revisions/<int:version>/', views.document_revision, name='document-revision'),
+    path('editor/<int:docid>/revisions/<int:version>/restore/', views.restore_document_revision,
+         name='restore-document-revision'),
     path('delete_document/<int:docid>/', views.delete_document, name='delete_document'),
     path('home/', views.home, name='home'),
     path('<str:room>/', views.room, name='room'),
@@ -1,17 +1,35 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from channels.layers import get_channel_layer
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.http import HttpResponse
+from django.template.loader import render_to_string
 from django.views.generic.list import ListView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView, FormView
 from django.urls import reverse_lazy
 from django.contrib.auth.views import LoginView
 from django.http import Http404, JsonResponse, HttpResponseBadRequest
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
+from django.views.decorators.vary import vary_on_cookie
 from .models import Task
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.shortcuts import redirect
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from .forms import UserUpdateForm, ProfileUpdateForm, UserRegisterForm
 from django.shortcuts import render
@@ -24,8 +42,20 @@ from django.views.generic import (
     DeleteView
 )
 from .models import Post
-from .models import Document
+from .models import Document, DocumentRevision
 from .models import Room, Message
+from .consumers import abroadcast_message, message_to_dict, room_group_name
+from .conditional import conditional, make_etag
+from .cache import (
+    get_feed_version, get_open_task_count, get_task_calendar_grid, get_task_list_page, invalidate_task_cache,
+)
+from .pagination import keyset_page, InvalidCursor, PAGE_SIZE
+from .replicas import use_replica
+from .search import get_search_backend
+from .metrics import registry
+from .documents import apply_patches, PatchError, revision_content, update_document
+
+logger = logging.getLogger(__name__)
 
 
 class CustomLoginView(LoginView):
@@ -62,36 +92,65 @@ class TaskList(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tasks'] = context['tasks'].filter(user=self.request.user)
-        context['count'] = context['tasks'].filter(complete=False).count()
+        context['count'] = get_open_task_count(self.request.user)
 
         search_input = self.request.GET.get('search-area') or ''
         if search_input:
-            context['tasks'] = context['tasks'].filter(title__startswith=search_input)
+            context['tasks'] = get_search_backend().filter_queryset(context['tasks'], 'task', search_input)
+            context['task_items'], context['next_cursor'] = render_task_page(self.request, context['tasks'])
 
             context['search_input'] = search_input
+        else:
+            context['task_items'], context['next_cursor'] = get_task_list_page(
+                self.request.user, lambda: render_task_page(self.request, context['tasks']))
 
         return context
 
 
+def render_task_page(request, tasks, cursor=None):
+    tasks, next_cursor = keyset_page(tasks, 'created', cursor)
+    return render_to_string('base/task_items.html', {'tasks': tasks}, request=request), next_cursor
+
+
+@use_replica
+@login_required
+def task_list_more(request):
+    tasks = Task.objects.filter(user=request.user)
+    search_input = request.GET.get('search-area') or ''
+    if search_input:
+        tasks = get_search_backend().filter_queryset(tasks, 'task', search_input)
+    try:
+        html, next_cursor = render_task_page(request, tasks, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+
 class TaskDetail(LoginRequiredMixin, DetailView):
     model = Task
     context_object_name = 'task'
     template_name = 'base/task.html'
 
 
-def task_create(request):
+def _create_task(request, fields):
+    task = Task(user=request.user, **fields)
+    task.full_clean()
+    task.save()
+
+
+async def task_create(request):
     title = request.POST['title']
     desc = request.POST['description']
     created = request.POST['created']
     if title and desc:
+        fields = {'title': title, 'description': desc, 'created': created}
         if request.POST['deadline']:
-            deadline = request.POST['deadline']
-            task_obj = Task(title=title, description=desc, user=request.user, deadline=deadline, created=created)
-        else:
-            task_obj = Task(title=title, description=desc, user=request.user, created=created)
+            fields['deadline'] = request.POST['deadline']
         status = 'success'
         try:
-            task_obj.save()
+            await sync_to_async(_create_task)(request, fields)
+        except ValidationError as e:
+            return HttpResponseBadRequest('; '.join(e.messages))
         except Exception as e:
             return HttpResponseBadRequest(e)
         response_data = {
@@ -105,6 +164,7 @@ from enum import Enum
 from datetime import datetime
 from django.utils.timezone import make_aware
 from calendar import monthrange
+from bisect import bisect_left, bisect_right
 import calendar
 
 
@@ -123,63 +183,64 @@ class Months(Enum):
     DECEMBER = 12
 
 
-def get_tasks_for_day(day, user=None):
-    if not user:
-        return [
-            {'task': task,
-             'deadline': task.deadline.day == day.day
-             } for task in Task.objects.filter(deadline__gte=day,
-                                               created__lte=day)]
-    return [
-        {'task': task,
-         'deadline': task.deadline.day == day.day
-         } for task in Task.objects.filter(deadline__gte=day,
-                                           created__lte=day, user=user)]
+def get_tasks_for_month(year, month, user=None):
+    """
+    Fetch every task overlapping the month in a single query and bucket it
+    into the days where ``created <= day <= deadline`` (days at midnight).
+    A task without a deadline goes on the day it was created. Each day lists
+    its tasks newest first.
+    """
+    num_of_days = monthrange(year, month)[1]
+    days = [datetime(year, month, i + 1) for i in range(num_of_days)]
+    aware_days = [make_aware(day) for day in days]
+
+    tasks = Task.objects.overlapping(aware_days[0], aware_days[-1])
+    if user:
+        tasks = tasks.filter(user=user)
+
+    buckets = [[] for _ in days]
+    for task in sorted(tasks, key=lambda task: task.created, reverse=True):
+        if task.deadline is None:
+            buckets[bisect_right(aware_days, task.created) - 1].append({'task': task, 'deadline': False})
+            continue
+        first = bisect_left(aware_days, task.created)
+        last = bisect_right(aware_days, task.deadline)
+        on_last_day = task.deadline < aware_days[last - 1] + timedelta(days=1)
+        deadline_index = last - 1 if on_last_day else None
+        for i in range(first, last):
+            buckets[i].append({'task': task, 'deadline': i == deadline_index})
+
+    return [{'tasks': buckets[i], 'day': day} for i, day in enumerate(days)]
+
+
+def render_calendar_grid(year, month, user):
+    return render_to_string('base/task_calendar_grid.html', {
+        'start_weekday': monthrange(year, month)[0],
+        'days': get_tasks_for_month(year, month, user=user),
+    })
 
 
-def task_calendar(request, year, month):
-    month_dt = monthrange(year, month)
-    start_weekday = month_dt[0]
-    num_of_days = month_dt[1]
-    context = {
-        'start_weekday': start_weekday,
-        'days': [
-            {
-                'tasks': get_tasks_for_day(datetime(year, month, i + 1), user=request.user),
-                'day': datetime(year, month, i + 1),
-            } for i in range(num_of_days)
-        ],
+def get_calendar_context(year, month, user):
+    return {
+        'calendar_grid': get_task_calendar_grid(user, year, month,
+                                                lambda: render_calendar_grid(year, month, user)),
         'month': datetime(year, month, 1).strftime('%B'),
         'next_month': {'month': month + 1 if month < 12 else 1, 'year': year if month < 12 else year + 1},
         'prev_month': {'month': month - 1 if month > 1 else 12, 'year': year if month > 1 else year - 1},
         'year': year,
     }
-    # print(context)
+
+
+# Not on the replica: the grid is cached under the current task version, so
+# a lagging read would be served for the whole cache timeout.
+def task_calendar(request, year, month):
+    context = get_calendar_context(year, month, user=request.user)
     return render(request, 'base/task_calendar.html', context)
 
 
 def calendar_current_month(request):
     dt = datetime.now()
-    year = dt.year
-    month = dt.month
-    month_dt = monthrange(year, month)
-    start_weekday = month_dt[0]
-    num_of_days = month_dt[1]
-    # print(request.user)
-    context = {
-        'start_weekday': start_weekday,
-        'days': [
-            {
-                'tasks': get_tasks_for_day(datetime(year, month, i + 1), user=request.user),
-                'day': datetime(year, month, i + 1),
-            } for i in range(num_of_days)
-        ],
-        'month': dt.strftime('%B'),
-        'next_month': {'month': month + 1 if month < 12 else 1, 'year': year if month < 12 else year + 1},
-        'prev_month': {'month': month - 1 if month > 1 else 12, 'year': year if month > 1 else year - 1},
-        'year': year,
-    }
-    # print(context)
+    context = get_calendar_context(dt.year, dt.month, user=request.user)
     return render(request, 'base/task_calendar.html', context)
 
 
@@ -205,25 +266,98 @@ class DeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('tasks')
 
 
-def check_task(request, task_id):
-    try:
-        task = Task.objects.get(id=task_id)
-        print('-----task object obtained-----')
-        task.complete = not task.complete
-        print('-----task object is to be saved-----')
-        print(task)
-        task.save()
-        response_data = {
-            'complete': task.complete
-        }
-        return JsonResponse(response_data)
-    except Exception as e:
-        print(e)
+def _toggle_task(request, task_id):
+    complete = Task.objects.toggle_complete(task_id, request.user)
+    if complete is not None:
+        invalidate_task_cache(request.user.pk)
+    return complete
+
+
+async def check_task(request, task_id):
+    # The ORM is synchronous in Django 4.0: one worker-thread hop for the
+    # lookup and update, everything else stays on the event loop.
+    complete = await sync_to_async(_toggle_task)(request, task_id)
+    if complete is None:
         raise Http404('Task not found')
+    logger.info('Task completion toggled', extra={
+        'task_id': task_id, 'user_id': request.user.pk, 'complete': complete,
+    })
+    return JsonResponse({'complete': complete})
 
 
-def get_task_ajax(request, task_id):
-    task = Task.objects.get(id=task_id)
+TASK_BULK_MAX_SIZE = 500
+TASK_BULK_MAX_SHIFT_DAYS = 3650
+
+
+@login_required
+@require_POST
+def task_bulk(request):
+    """
+    Apply one operation to many of the user's tasks in a single transaction.
+
+    Expects a JSON body ``{"operation": ..., "ids": [...]}`` where operation is
+    ``complete``, ``uncomplete``, ``delete`` or ``shift_deadline`` (with
+    ``"days": N``), or ``{"operation": "create", "tasks": [{...}, ...]}``.
+    """
+    try:
+        data = json.loads(request.body)
+        operation = data['operation']
+        ids = data.get('ids', [])
+        new_tasks = data.get('tasks', [])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return HttpResponseBadRequest('Invalid request body')
+    if not isinstance(ids, list) or not all(type(task_id) is int for task_id in ids):
+        return HttpResponseBadRequest('ids must be a list of task ids')
+    if not isinstance(new_tasks, list) or not all(isinstance(task, dict) for task in new_tasks):
+        return HttpResponseBadRequest('tasks must be a list of objects')
+    if max(len(ids), len(new_tasks)) > TASK_BULK_MAX_SIZE:
+        return HttpResponseBadRequest(f'At most {TASK_BULK_MAX_SIZE} tasks per request')
+
+    tasks = Task.objects.filter(user=request.user, id__in=ids)
+    response_data = {'operation': operation}
+    try:
+        with transaction.atomic():
+            if operation in ('complete', 'uncomplete'):
+                response_data['count'] = tasks.update(complete=operation == 'complete')
+            elif operation == 'delete':
+                response_data['count'] = tasks.delete()[1].get(Task._meta.label, 0)
+            elif operation == 'shift_deadline':
+                days = data.get('days')
+                if type(days) is not int or abs(days) > TASK_BULK_MAX_SHIFT_DAYS:
+                    return HttpResponseBadRequest(
+                        f'days must be a whole number from -{TASK_BULK_MAX_SHIFT_DAYS} to {TASK_BULK_MAX_SHIFT_DAYS}')
+                delta = timedelta(days=days)
+                tasks = tasks.filter(deadline__isnull=False)
+                if delta < timedelta(0) and tasks.filter(deadline__lt=timezone.now() - delta).exists():
+                    raise ValidationError({'deadline': 'The date cannot be in the past!'})
+                response_data['count'] = tasks.update(deadline=F('deadline') + delta)
+            elif operation == 'create':
+                objs = [Task(user=request.user, title=task.get('title', ''), description=task.get('description'),
+                             created=task.get('created'), deadline=task.get('deadline')) for task in new_tasks]
+                for obj in objs:
+                    obj.full_clean()
+                created = Task.objects.bulk_create(objs)
+                get_search_backend().index_many(created)
+                response_data['count'] = len(created)
+                response_data['ids'] = [obj.pk for obj in created]
+            else:
+                return HttpResponseBadRequest(f'Unknown operation {operation!r}')
+    except ValidationError as e:
+        return HttpResponseBadRequest('; '.join(e.messages))
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return HttpResponseBadRequest('Invalid request body')
+
+    invalidate_task_cache(request.user.pk)
+    return JsonResponse(response_data)
+
+
+def _get_task(request, task_id):
+    return get_object_or_404(Task.objects.only('title', 'description', 'deadline', 'created'),
+                             pk=task_id, user=request.user)
+
+
+async def get_task_ajax(request, task_id):
+    task = await sync_to_async(_get_task)(request, task_id)
     response_data = {
         'title': task.title,
         'description': task.description,
@@ -271,22 +405,45 @@ def register(request):
     return render(request, 'base/register.html', {'form': form})
 
 
-def home(request):
-    context = {
-        'posts': Post.objects.all()
-    }
-    return render(request, 'base/posts.html', context)
+def feed_validators(request, *args, **kwargs):
+    feed = Post.objects.order_by().aggregate(latest=Max('modified_at'), count=Count('id'))
+    # Renaming an author or processing their picture leaves the posts untouched; the feed version moves.
+    version = get_feed_version()
+    changed = datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+    latest = max(feed['latest'], changed) if feed['latest'] else changed
+    return make_etag('posts', feed['latest'], feed['count'], version), latest
 
 
+@method_decorator(conditional(feed_validators), name='dispatch')
 class PostListView(ListView):
+    use_replica = True
     model = Post
+    queryset = Post.objects.for_feed()
     template_name = 'base/posts.html'  # <app>/<model>_<viewtype>.html
     context_object_name = 'posts'
     ordering = ['-date_posted']
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['posts'], context['next_cursor'] = keyset_page(context['posts'], 'date_posted')
+        return context
+
+
+@use_replica
+@conditional(feed_validators)
+def post_list_more(request):
+    try:
+        posts, next_cursor = keyset_page(Post.objects.for_feed(), 'date_posted', request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    html = render_to_string('base/post_items.html', {'posts': posts}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
 
 class PostDetailView(DetailView):
+    use_replica = True
     model = Post
+    queryset = Post.objects.select_related('author__profile')
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -313,45 +470,142 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return False
 
 
+def search(request):
+    query = request.GET.get('q', '')
+    kinds = request.GET.getlist('type') or None
+    results = get_search_backend().search(query, user=request.user, kinds=kinds)
+    return JsonResponse({'query': query, 'results': results})
+
+
+@staff_member_required
+def metrics(request):
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def about(request):
     return render(request, 'base/about.html', {'title': 'About'})
 
 
-def editor(request):
-    docid = int(request.GET.get('docid', 0))
-    documents = Document.objects.all()
+def editor_validators(request):
+    documents = Document.objects.order_by().aggregate(latest=Max('modified_at'), count=Count('id'))
+    # The page embeds a CSRF token, so a copy is only valid with the same cookie.
+    etag = make_etag('documents', documents['latest'], documents['count'], request.META.get('CSRF_COOKIE'))
+    return etag, documents['latest']
 
+
+@vary_on_cookie
+@cache_control(private=True)
+@conditional(editor_validators)
+def editor(request):
     if request.method == 'POST':
         docid = int(request.POST.get('docid', 0))
-        title = request.POST.get('title')
         content = request.POST.get('content', '')
+        title = request.POST.get('title') or Document.make_title(content)
 
         if docid > 0:
-            document = Document.objects.get(pk=docid)
-            document.title = title
-            document.content = content
-            document.save()
-
-            return redirect('editor')
+            document = get_object_or_404(Document, pk=docid)
+            if update_document(document, content, title) is None:
+                return HttpResponse('The note was saved elsewhere at the same time; reload and try again.',
+                                    status=409)
         else:
-            document = Document.objects.create(title=title, content=content)
+            Document.objects.create(title=title, content=content)
 
-    if docid > 0:
-        document = Document.objects.get(pk=docid)
-    else:
-        document = ''
+        return redirect('editor')
+
+    docid = int(request.GET.get('docid', 0))
+    try:
+        documents, next_cursor = keyset_page(Document.objects.only('id', 'title', 'modified_at'), 'modified_at',
+                                             request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+
+    document = get_object_or_404(Document, pk=docid) if docid > 0 else ''
     context = {
         'docid': docid,
         'documents': documents,
+        'next_cursor': next_cursor,
         'document': document
     }
 
     return render(request, 'base/editor.html', context)
 
 
+@require_POST
+def autosave_document(request, docid):
+    """
+    Apply text patches to a document if it is still at the version the client
+    edited. Returns the new version, or 409 with the current one when stale.
+    """
+    try:
+        data = json.loads(request.body)
+        version = int(data['version'])
+        patches = list(data['patches'])
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Invalid request body')
+
+    document = get_object_or_404(Document, pk=docid)
+    if document.version != version:
+        return JsonResponse({'error': 'stale', 'version': document.version}, status=409)
+    try:
+        content = apply_patches(document.content or '', patches)
+    except PatchError as e:
+        return HttpResponseBadRequest(str(e))
+
+    new_version = update_document(document, content)
+    if new_version is None:
+        current = Document.objects.filter(pk=docid).values_list('version', flat=True).first()
+        return JsonResponse({'error': 'stale', 'version': current}, status=409)
+    return JsonResponse({'version': new_version})
+
+
+@use_replica
+def document_revisions(request, docid):
+    """Stored versions of a document, newest first, paged with ``?before=<version>``."""
+    document = get_object_or_404(Document.objects.only('id', 'version'), pk=docid)
+    revisions = DocumentRevision.objects.filter(document=document).only('id', 'version', 'modified_at', 'snapshot')
+    try:
+        if request.GET.get('before'):
+            revisions = revisions.filter(version__lt=int(request.GET['before']))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid version')
+    revisions = list(revisions.order_by('-version')[:PAGE_SIZE + 1])
+    return JsonResponse({
+        'version': document.version,
+        'revisions': [
+            {'version': revision.version, 'modified_at': revision.modified_at, 'snapshot': revision.snapshot}
+            for revision in revisions[:PAGE_SIZE]
+        ],
+        'has_more': len(revisions) > PAGE_SIZE,
+    })
+
+
+@use_replica
+def document_revision(request, docid, version):
+    document = get_object_or_404(Document.objects.only('id', 'content', 'version'), pk=docid)
+    try:
+        content = revision_content(document, version)
+    except DocumentRevision.DoesNotExist:
+        raise Http404('No such revision')
+    return JsonResponse({'version': version, 'content': content})
+
+
+@require_POST
+def restore_document_revision(request, docid, version):
+    """Save an old version as the newest one, so the restore itself can be undone."""
+    document = get_object_or_404(Document, pk=docid)
+    try:
+        content = revision_content(document, version)
+    except DocumentRevision.DoesNotExist:
+        raise Http404('No such revision')
+    new_version = update_document(document, content)
+    if new_version is None:
+        current = Document.objects.filter(pk=docid).values_list('version', flat=True).first()
+        return JsonResponse({'error': 'stale', 'version': current}, status=409)
+    return JsonResponse({'version': new_version})
+
+
 def delete_document(request, docid):
-    document = Document.objects.get(pk=docid)
-    document.delete()
+    Document.objects.only('id').filter(pk=docid).delete()
 
     return redirect('editor')
 
@@ -382,18 +636,111 @@ def checkview(request):
         return redirect('/'+room + '/?username=' + username)
 
 
-def send(request):
+async def send(request):
     message = request.POST['message']
     username = request.POST['username']
-    room_id = request.POST['room_id']
+    room_id = int(request.POST['room_id'])
 
-    new_message = Message.objects.create(value=message, user=username, room=room_id)
-    new_message.save()
+    new_message = await sync_to_async(Message.objects.create)(value=message, user=username, room_id=room_id)
+    await abroadcast_message(new_message)
     return HttpResponse('Message sent successfully')
 
 
-def getMessages(request, room):
-    room_details = Room.objects.get(name=room)
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+MESSAGES_MAX_WAIT = 25
 
-    messages = Message.objects.filter(room=room_details.id)
-    return JsonResponse({"messages": list(messages.values())})
+
+def _long_poll_wait(request):
+    """
+    Seconds ``?wait`` may hold the request open; raises ValueError if it is
+    not a number. Always 0 outside ASGI: a new message wakes the poll through
+    the channel layer on the server's event loop, which a WSGI worker running
+    the view in its own loop never hears from, so it would sleep out the wait.
+    """
+    wait = float(request.GET.get('wait', 0))
+    if not isinstance(request, ASGIRequest):
+        return 0
+    return min(wait, MESSAGES_MAX_WAIT)
+
+
+def _room_id(request, room):
+    """Look the room up once per request, for the validators and the view alike."""
+    if not hasattr(request, '_room_id'):
+        request._room_id = get_object_or_404(Room.objects.only('id'), name=room).pk
+    return request._room_id
+
+
+def _message_page(room_id, after, before, limit):
+    messages = Message.objects.filter(room_id=room_id)
+    if after:
+        page = list(messages.filter(id__gt=after).order_by('id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+    else:
+        if before:
+            messages = messages.filter(id__lt=before)
+        page = list(messages.order_by('-id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit][::-1]
+    return [message_to_dict(message) for message in page], has_more
+
+
+def message_validators(request, room):
+    try:
+        if _long_poll_wait(request) > 0:
+            # A long poll only ever answers with what is new.
+            return None, None
+    except ValueError:
+        return None, None
+    room_id = _room_id(request, room)
+    latest = Message.objects.filter(room_id=room_id).aggregate(latest=Max('id'))['latest']
+    return make_etag('messages', room_id, latest), None
+
+
+@use_replica
+@conditional(message_validators)
+async def getMessages(request, room):
+    """
+    Return a page of messages for the room in ascending id order.
+
+    ``?after=<id>`` returns messages newer than the cursor, ``?before=<id>``
+    pages backwards through older history and no cursor returns the latest
+    page. ``has_more`` tells whether another page exists in that direction.
+    With ``after``, ``?wait=<seconds>`` holds the request open until a new
+    message arrives, without tying up a thread while it waits. It only
+    applies under ASGI; see ``_long_poll_wait``.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        before = int(request.GET.get('before', 0))
+        limit = int(request.GET.get('limit', MESSAGES_PAGE_SIZE))
+        wait = _long_poll_wait(request)
+    except ValueError:
+        return HttpResponseBadRequest('after, before, limit and wait must be numbers')
+    if limit < 1:
+        return HttpResponseBadRequest('limit must be positive')
+    limit = min(limit, MESSAGES_MAX_PAGE_SIZE)
+
+    room_id = await sync_to_async(_room_id)(request, room)
+    page, has_more = await sync_to_async(_message_page)(room_id, after, before, limit)
+    channel_layer = get_channel_layer()
+    if page or not (after and wait > 0 and channel_layer is not None):
+        return JsonResponse({"messages": page, "has_more": has_more})
+
+    # Nothing new yet: join the room's group, then read once more so a message
+    # sent in between is not missed, and otherwise sleep until one arrives.
+    group, channel = room_group_name(room_id), await channel_layer.new_channel()
+    await channel_layer.group_add(group, channel)
+    try:
+        page, has_more = await sync_to_async(_message_page)(room_id, after, before, limit)
+        if not page:
+            try:
+                await asyncio.wait_for(channel_layer.receive(channel), wait)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                page, has_more = await sync_to_async(_message_page)(room_id, after, before, limit)
+    finally:
+        await channel_layer.group_discard(group, channel)
+    return JsonResponse({"messages": page, "has_more": has_more})
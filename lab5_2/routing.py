@@ -1,2 +1,7 @@
-from channels.auth import AuthMiddlewareStack
+from django.urls import path
 
+from base import consumers
+
+websocket_urlpatterns = [
+    path('ws/chat/<int:room_id>/', consumers.ChatConsumer.as_asgi()),
+]
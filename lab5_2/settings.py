@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     # 'base.apps.BaseConfig',
     'base.apps.UsersConfig',
     'base.apps.BlogConfig',
@@ -48,11 +51,13 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'base.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'base.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,9 +66,8 @@ ROOT_URLCONF = 'lab5_2.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'base.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -71,11 +75,27 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process, in DEBUG too; the
+            # autoreloader clears the cache when a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'lab5_2.wsgi.application'
+ASGI_APPLICATION = 'lab5_2.asgi.application'
+
+# In-memory layer for local runs; use channels_redis when running several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -88,6 +108,95 @@ DATABASES = {
     }
 }
 
+# Applied to every new SQLite connection that lists them under 'PRAGMAS'
+# (see base.signals). WAL lets the chat writer and the pollers work at once.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+}
+
+# DB_PROFILE=production keeps connections open across requests. Under ASGI,
+# Django 4.0 runs each request on a fresh thread, so set DB_CONN_MAX_AGE=0 there.
+if os.environ.get('DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        # Built in from Django 4.1; base.signals does the check on 4.0.
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    })
+
+# Read replica: a copy of the primary (kept in sync by the deployment, or
+# `manage.py sync_replica`). Views marked with base.replicas.use_replica
+# read from it once DB_REPLICA_NAME is set.
+DATABASES['replica'] = dict(
+    DATABASES['default'],
+    NAME=os.environ.get('DB_REPLICA_NAME', os.path.join(BASE_DIR, 'db.replica.sqlite3')),
+)
+REPLICA_DATABASE = 'replica' if os.environ.get('DB_REPLICA_NAME') else None
+# Seconds a session keeps reading from the primary after it writes.
+REPLICA_STICKY_SECONDS = 5
+DATABASE_ROUTERS = ['base.replicas.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+# Task writes invalidate cached lists, counts and calendars by bumping a
+# version key in this cache. The local-memory cache is per process, so with
+# more than one worker every process must share one cache: set REDIS_URL.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lab5_2',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('REDIS_URL is set but the redis package is not installed.')
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+
+# Logging
+# Set BASE_LOG_LEVEL=INFO to get one performance line per request.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'base': {
+            'handlers': ['console'],
+            'level': os.environ.get('BASE_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
+
+# Full-text search over tasks, posts and documents; use
+# base.search.SimpleSearchBackend on databases without FTS5.
+SEARCH_BACKEND = 'base.search.FTS5SearchBackend'
+
+# Document history: a full snapshot every N versions, deltas in between
+# (see `manage.py benchmark_revisions`). None keeps every revision.
+DOCUMENT_SNAPSHOT_INTERVAL = 10
+DOCUMENT_REVISION_LIMIT = None
+
+# Document and message bodies of at least this many bytes are stored
+# zlib-compressed (see `manage.py benchmark_storage`). None disables it.
+COMPRESSED_TEXT_THRESHOLD = 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -128,6 +237,12 @@ LOGIN_URL = 'login'
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed copies, so browsers can cache the CSS
+# for good and pick up a new file name when it changes.
+if not DEBUG:
+    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'